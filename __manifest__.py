@@ -11,8 +11,12 @@
     "data": [
         "security/ir_rule.xml",
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/account_move_template_views.xml",
+        "views/account_move_template_stat_views.xml",
+        "views/account_move_template_import_views.xml",
         "wizard/account_move_template_run_views.xml",
+        "wizard/account_move_template_replicate_views.xml",
     ],
     "installable": True,
 }
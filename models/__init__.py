@@ -1,2 +1,14 @@
+from . import account_account
+from . import account_journal
+from . import account_move
+from . import account_move_template_cron_mixin
 from . import account_move_template
+from . import account_move_template_import
+from . import account_move_template_import_error
+from . import account_move_template_job
 from . import account_move_template_line
+from . import account_move_template_posting
+from . import account_move_template_recurring
+from . import account_move_template_replication
+from . import account_move_template_stat
+from . import account_payment
@@ -0,0 +1,41 @@
+from odoo import api, models
+
+
+class AccountAccount(models.Model):
+    _inherit = "account.account"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        accounts = super().create(vals_list)
+        self.env["account.move.template.line"]._recompute_resolved_account(
+            accounts._get_template_codes(), accounts.company_ids
+        )
+        return accounts
+
+    def write(self, vals):
+        if not {"code", "code_store", "company_ids", "deprecated"}.intersection(vals):
+            return super().write(vals)
+        codes = self._get_template_codes()
+        companies = self.company_ids
+        res = super().write(vals)
+        self.env["account.move.template.line"]._recompute_resolved_account(
+            codes | self._get_template_codes(), companies | self.company_ids
+        )
+        return res
+
+    def unlink(self):
+        codes = self._get_template_codes()
+        companies = self.company_ids
+        res = super().unlink()
+        self.env["account.move.template.line"]._recompute_resolved_account(
+            codes, companies
+        )
+        return res
+
+    def _get_template_codes(self):
+        """Return the codes of the accounts in each of their companies, which
+        the account prefixes of the templates are matched against"""
+        codes = set()
+        for company in self.company_ids:
+            codes.update(self.with_company(company).mapped("code"))
+        return codes
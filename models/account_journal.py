@@ -0,0 +1,33 @@
+from odoo import api, models
+
+
+class AccountJournal(models.Model):
+    _inherit = "account.journal"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        journals = super().create(vals_list)
+        self.env["account.move.template"]._recompute_resolved_journal(
+            set(journals.mapped("code")), journals.company_id
+        )
+        return journals
+
+    def write(self, vals):
+        if not {"code", "company_id", "active"}.intersection(vals):
+            return super().write(vals)
+        codes = set(self.mapped("code"))
+        companies = self.company_id
+        res = super().write(vals)
+        self.env["account.move.template"]._recompute_resolved_journal(
+            codes | set(self.mapped("code")), companies | self.company_id
+        )
+        return res
+
+    def unlink(self):
+        codes = set(self.mapped("code"))
+        companies = self.company_id
+        res = super().unlink()
+        self.env["account.move.template"]._recompute_resolved_journal(
+            codes, companies
+        )
+        return res
@@ -1,13 +1,170 @@
-from odoo import api, fields, models
+import copy
+import cProfile
+import datetime
+import functools
+import itertools
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from ast import literal_eval
+from collections import OrderedDict, defaultdict, namedtuple
+from contextlib import contextmanager
+
+from odoo import Command, api, fields, models, tools
+from odoo.exceptions import UserError, ValidationError
+from odoo.osv import expression
+from odoo.tools import escape_psql
+from odoo.tools.cache import STAT
 from odoo.tools.translate import _
 
+from .account_move_template_line import (
+    FORMULA_FUNCTIONS,
+    LINE_REFERENCE,
+    SNAPSHOT_LINE_FIELDS,
+    TemplateLineSnapshot,
+    compile_formula,
+    sort_formulas,
+)
+from .account_move_template_stat import (
+    RunTracker,
+    get_tracker,
+    set_tracker,
+    track_phase,
+)
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    _logger.debug("Cannot import numpy, formulas are evaluated run by run.")
+    numpy = None
+
+# Order of the values when run parameters are given as tuples
+RUN_PARAMS = ("date", "partner_id", "ref", "amount", "overwrite")
+
+# Fields of the template copied in its snapshot, see _build_snapshot
+SNAPSHOT_FIELDS = (
+    "company_id",
+    "move_type",
+    "journal_code",
+    "resolved_journal_id",
+    "invoice_payment_term_id",
+)
+TemplateSnapshot = namedtuple(
+    "TemplateSnapshot",
+    (
+        "id",
+        *SNAPSHOT_FIELDS,
+        "lines",
+        "input_sequences",
+        "account_codes",
+        "program",
+        "version",
+    ),
+)
+# Version of the snapshots, which changes each time one is built
+_snapshot_versions = itertools.count(1)
+
+
+class MoveValsCache:
+    """LRU cache of the move values of the runs, bounded by the total number
+    of lines of the cached moves rather than by their number, a template
+    having up to thousands of lines"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lines = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, vals, max_lines):
+        """Cache ``vals``, evicting the least recently used moves to keep at
+        most ``max_lines`` lines"""
+        size = len(vals["line_ids"]) + 1
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._lines -= previous[1]
+            if size > max_lines:
+                return
+            while self._lines + size > max_lines:
+                self._lines -= self._entries.popitem(last=False)[1][1]
+            self._entries[key] = (vals, size)
+            self._lines += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._lines = 0
+
+
+# Move values of the runs of the templates, by run, see _prepare_moves_vals
+_move_vals_cache = MoveValsCache()
+
+# Types accepted in an overwrite for each type of field of the wizard lines
+OVERWRITE_TYPES = {
+    "many2one": (int,),
+    "integer": (int,),
+    "float": (int, float),
+    "monetary": (int, float),
+    "char": (str,),
+    "text": (str,),
+}
+
+
+def _round_amount(amount, ndigits=None):
+    """Python ``round`` of an amount of a column.
+
+    ``numpy.round`` scales the amount before rounding it, which gives another
+    result than ``round`` for some amounts, e.g. 23496.385 to 2 digits.
+    """
+    amount = float(amount)
+    if not math.isfinite(amount):
+        # reported as a division by zero by _compute_formula_amounts_batch
+        return amount
+    return round(amount, None if ndigits is None else int(ndigits))
+
+
+if numpy is not None:
+    # Element-wise counterparts of FORMULA_FUNCTIONS for columns of amounts
+    VECTOR_FORMULA_FUNCTIONS = {
+        "abs": numpy.abs,
+        "min": lambda *args: functools.reduce(numpy.minimum, args),
+        "max": lambda *args: functools.reduce(numpy.maximum, args),
+        "round": numpy.vectorize(_round_amount, otypes=[float]),
+    }
+
+
+def _round_column(column, rounding):
+    """Round a column of amounts half-up like ``float_round`` does"""
+    normalized = column / rounding
+    with numpy.errstate(divide="ignore"):
+        epsilon = numpy.exp2(numpy.log2(numpy.abs(normalized)) - 52)
+    normalized = normalized + numpy.sign(normalized) * epsilon
+    return numpy.sign(normalized) * numpy.floor(numpy.abs(normalized) + 0.5) * rounding
+
 
 class AccountMoveTemplate(models.Model):
     _name = "account.move.template"
     _description = "Journal Entry Template"
+    _inherit = ["account.move.template.cron.mixin"]
     _check_company_auto = True
+    _rec_names_search = ["name", "ref", "journal_code"]
 
-    name = fields.Char(required=True, index=True, translate=True)
+    name = fields.Char(required=True, index="trigram", translate=True)
     active = fields.Boolean(default=True)
     company_id = fields.Many2one(
         comodel_name="res.company",
@@ -24,9 +181,19 @@ class AccountMoveTemplate(models.Model):
     journal_code = fields.Char(
         string="Journal Code",
         required=True,
+        index="trigram",
         help="When creating a new journal entry a journal having this code"
         "will be looked for",
     )
+    resolved_journal_id = fields.Many2one(
+        comodel_name="account.journal",
+        string="Resolved Journal",
+        compute="_compute_resolved_journal_id",
+        store=True,
+        ondelete="set null",
+        help="Journal of the company of the template having the journal code, "
+        "used by the runs in that company instead of looking for it",
+    )
     partner_id = fields.Many2one(
         comodel_name="res.partner",
         string="Partner",
@@ -51,6 +218,7 @@ class AccountMoveTemplate(models.Model):
     )
     ref = fields.Char(
         string="Reference",
+        index="trigram",
         help="Internal reference or note",
     )
     line_ids = fields.One2many(
@@ -73,6 +241,18 @@ class AccountMoveTemplate(models.Model):
         string="Partner Type",
         help="Determines whether the payment is for a customer or vendor",
     )
+    generation_job_ids = fields.One2many(
+        comodel_name="account.move.template.job",
+        inverse_name="template_id",
+        string="Generation Chunks",
+        readonly=True,
+    )
+    snapshot_version = fields.Integer(
+        readonly=True,
+        copy=False,
+        help="Changed when the template or its lines change, see "
+        "_invalidate_snapshot",
+    )
 
     _sql_constraints = [
         (
@@ -82,6 +262,572 @@ class AccountMoveTemplate(models.Model):
         ),
     ]
 
+    def init(self):
+        # the snapshot versions come from a sequence, see _invalidate_snapshot
+        self.env.cr.execute(
+            "CREATE SEQUENCE IF NOT EXISTS account_move_template_snapshot_version_seq"
+        )
+
+    @api.depends("journal_code", "company_id")
+    def _compute_resolved_journal_id(self):
+        for template in self:
+            if template.company_id and template.journal_code:
+                template.resolved_journal_id = template._get_journal_by_code(
+                    template.journal_code, template.company_id
+                )
+            else:
+                template.resolved_journal_id = False
+
+    @api.model
+    def _recompute_resolved_journal(self, codes, companies):
+        """Recompute the resolved journal of the templates having one of the
+        journal ``codes``, in ``companies`` and their branches, after these
+        journals changed.
+
+        The journal lookup cache is only cleared when a template uses one of
+        the codes.
+        """
+        codes = [code for code in codes if code]
+        Template = self.sudo().with_context(active_test=False)
+        if not codes or not Template.search_count(
+            [("journal_code", "in", codes)], limit=1
+        ):
+            return
+        self.env.registry.clear_cache()
+        templates = Template.search(
+            [("journal_code", "in", codes), ("company_id", "child_of", companies.ids)]
+        )
+        self.env.add_to_compute(self._fields["resolved_journal_id"], templates)
+        templates._invalidate_snapshot()
+
+    def _get_run_journal(self, company):
+        """Return the journal of the runs of the template in ``company``.
+
+        The context key ``template_journal_ids`` may map company ids to the
+        journals already looked for, see ``generate_entries_for_companies``.
+        """
+        snapshot = self._get_snapshot()
+        if company.id == snapshot.company_id and snapshot.resolved_journal_id:
+            return self.env["account.journal"].browse(snapshot.resolved_journal_id)
+        journal_ids = self.env.context.get("template_journal_ids")
+        if journal_ids and company.id in journal_ids:
+            return self.env["account.journal"].browse(journal_ids[company.id])
+        return self._get_journal_by_code(snapshot.journal_code, company)
+
+    def _get_journal_ids_by_company(self, companies):
+        """Return the journals having the journal code of the template, for
+        all of ``companies`` in a single query.
+
+        :return: dict mapping company ids to journal ids, a journal of a
+            parent company being used for its branches as the journal lookup
+            does
+        """
+        self.ensure_one()
+        Journal = self.env["account.journal"].sudo()
+        with track_phase("journal_lookup"):
+            journals = Journal.search(
+                expression.AND(
+                    [
+                        Journal._check_company_domain(companies),
+                        [("code", "=", self._get_snapshot().journal_code)],
+                    ]
+                )
+            )
+        journal_ids = {}
+        for company in companies:
+            for parent in reversed(company.parent_ids):
+                journal = journals.filtered(lambda j, p=parent: j.company_id == p)
+                if journal:
+                    journal_ids[company.id] = journal[0].id
+                    break
+        return journal_ids
+
+    @api.model
+    def _get_journal_by_code(self, code, company):
+        """Return the journal of ``company`` having ``code``, from the cache"""
+        with track_phase("journal_lookup"):
+            journal_id = self._get_journal_id_by_code(company.id, code)
+        return self.env["account.journal"].browse(journal_id)
+
+    @api.model
+    @tools.ormcache("company_id", "code")
+    def _get_journal_id_by_code(self, company_id, code):
+        Journal = self.env["account.journal"].sudo()
+        journal = Journal.search(
+            expression.AND(
+                [Journal._check_company_domain(company_id), [("code", "=", code)]]
+            ),
+            limit=1,
+        )
+        return journal.id
+
+    @api.model
+    def _resolve_account_codes(self, codes, company):
+        """Resolve account prefixes to account ids in a single query.
+
+        Each prefix is matched against the codes of ``company`` the same way
+        the "Accounts Prefix" field describes it: the account whose code
+        starts with the prefix, an exact match or the lowest code winning.
+        Results are cached per company and set of prefixes until a journal
+        or an account changes.
+
+        :return: dict mapping each resolvable prefix to an account id
+        """
+        prefixes = tuple(sorted({code for code in codes if code}))
+        if not prefixes:
+            return {}
+        with track_phase("account_lookup"):
+            return dict(self._get_account_ids_by_prefix(company.id, prefixes))
+
+    @api.model
+    @tools.ormcache("company_id", "prefixes")
+    def _get_account_ids_by_prefix(self, company_id, prefixes):
+        Account = self.env["account.account"].sudo().with_company(company_id)
+        domain = expression.OR(
+            [
+                [("code_store", "=like", "%s%%" % escape_psql(prefix))]
+                for prefix in prefixes
+            ]
+        )
+        accounts = Account.search(
+            expression.AND(
+                [
+                    Account._check_company_domain(company_id),
+                    [("deprecated", "=", False)],
+                    domain,
+                ]
+            )
+        )
+        account_map = {}
+        for account in accounts.sorted(lambda acc: acc.code_store or ""):
+            code = account.code_store or ""
+            for size in range(1, len(code) + 1):
+                if code[:size] in prefixes:
+                    account_map.setdefault(code[:size], account.id)
+        return tuple(account_map.items())
+
+    @api.model
+    def _get_code_cache_stats(self):
+        """Return the hit/miss counters of the journal and account code caches.
+
+        These are the counters ``log_ormcache_stats`` dumps on SIGUSR1, exposed
+        here so they can be polled without signaling the workers.
+        """
+        stats = {}
+        for method_name in ("_get_journal_id_by_code", "_get_account_ids_by_prefix"):
+            method = getattr(type(self), method_name).__cache__.method
+            counter = STAT[(self.pool.db_name, self._name, method)]
+            stats[method_name] = {"hit": counter.hit, "miss": counter.miss}
+        return stats
+
+    def _get_snapshot(self):
+        """Return the snapshot of the template, see ``_build_snapshot``"""
+        self.ensure_one()
+        return self._build_snapshot(self.id, self.snapshot_version)
+
+    def _invalidate_snapshot(self):
+        """Make the runs build the snapshots of the templates again, after
+        them or their lines changed.
+
+        The new versions are taken from a sequence, which is not rolled back:
+        a version cached by a transaction rolled back afterwards is never
+        given to another state of the template.
+        """
+        if not self:
+            return
+        self.env.cr.execute(
+            """
+            UPDATE account_move_template
+            SET snapshot_version = nextval('account_move_template_snapshot_version_seq')
+            WHERE id IN %s
+            """,
+            [tuple(self.ids)],
+        )
+        self.invalidate_recordset(["snapshot_version"])
+
+    @api.model
+    @tools.ormcache("template_id", "snapshot_version")
+    def _build_snapshot(self, template_id, snapshot_version):
+        """Read the template and its lines once for all the runs.
+
+        The snapshot is cached by each worker for each ``snapshot_version`` of
+        the template, which changes with the template or its lines, so that
+        runs neither browse nor filter the lines again. Outdated snapshots are
+        left to the eviction of the cache.
+
+        :return: immutable ``TemplateSnapshot``, the lines being
+            ``TemplateLineSnapshot`` with relational fields as ids, and the
+            formulas of the computed lines compiled in evaluation order
+        """
+        template = self.sudo().browse(template_id)
+        lines = tuple(
+            TemplateLineSnapshot(**vals)
+            for vals in self.env["account.move.template.line"]
+            .sudo()
+            .search_read(
+                [("template_id", "=", template_id)],
+                SNAPSHOT_LINE_FIELDS,
+                load=None,
+            )
+        )
+        input_sequences = tuple(
+            line.sequence for line in lines if line.type == "input"
+        )
+        template_vals = template.read(list(SNAPSHOT_FIELDS), load=None)[0]
+        return TemplateSnapshot(
+            **template_vals,
+            lines=lines,
+            input_sequences=input_sequences,
+            account_codes=tuple({line.account_code: None for line in lines}),
+            program=template._compile_formulas(lines, input_sequences),
+            version=next(_snapshot_versions),
+        )
+
+    def _get_formula_program(self):
+        """Return the compiled formulas of the computed lines of the template.
+
+        Formulas are parsed and compiled once per version of the template, in
+        its snapshot, and reused by every run.
+
+        :return: tuple of (sequence, code object, referenced sequences), in
+            evaluation order: every formula comes after the lines it references
+        """
+        return self._get_snapshot().program
+
+    def _compile_formulas(self, lines, input_sequences):
+        self.ensure_one()
+        compiled = {}
+        for line in lines:
+            if line.type != "computed":
+                continue
+            try:
+                compiled[line.sequence] = compile_formula(line.python_code)
+            except SyntaxError as err:
+                raise UserError(
+                    _(
+                        "Impossible to compute the formula of line with sequence "
+                        "%(sequence)s (formula: %(code)s): the syntax of the "
+                        "formula is wrong."
+                    )
+                    % {"sequence": line.sequence, "code": line.python_code}
+                ) from err
+            except ValueError as err:
+                raise UserError(
+                    _(
+                        "Impossible to compute the formula of line with sequence "
+                        "%(sequence)s (formula: %(code)s): %(error)s"
+                    )
+                    % {
+                        "sequence": line.sequence,
+                        "code": line.python_code,
+                        "error": err,
+                    }
+                ) from err
+        try:
+            order = sort_formulas(
+                {sequence: refs for sequence, (_code, refs) in compiled.items()},
+                input_sequences,
+            )
+        except ValueError as err:
+            raise UserError(
+                _("Impossible to compute the formulas of template %(name)s: %(error)s")
+                % {"name": self.name, "error": err}
+            ) from err
+        return tuple((sequence, *compiled[sequence]) for sequence in order)
+
+    def _get_input_sequences(self):
+        return self._get_snapshot().input_sequences
+
+    def _get_overwrite_schema(self):
+        """Return the schema of the overwrites, see ``_build_overwrite_schema``"""
+        self.ensure_one()
+        return self._build_overwrite_schema(self.id, self.snapshot_version)
+
+    @api.model
+    @tools.ormcache("template_id", "snapshot_version")
+    def _build_overwrite_schema(self, template_id, snapshot_version):
+        """Return what the overwrite of the runs of the template may contain.
+
+        Cached along with the snapshot of the template.
+
+        :return: tuple (dict mapping the line keys ``L<sequence>`` to the
+            sequences, dict mapping the valid keys of a line overwrite to the
+            wizard line field they set and the types of value it accepts)
+        """
+        snapshot = self.browse(template_id)._get_snapshot()
+        line_fields = self.env["account.move.template.line.run"]._fields
+        amount_field = "balance" if snapshot.move_type == "entry" else "price_unit"
+        fields_types = {}
+        for key in self.env["account.move.template.run"]._get_valid_keys():
+            field_name = amount_field if key == "amount" else key
+            fields_types[key] = (
+                field_name,
+                OVERWRITE_TYPES.get(line_fields[field_name].type, (object,)),
+            )
+        line_keys = {"L%d" % line.sequence: line.sequence for line in snapshot.lines}
+        return line_keys, fields_types
+
+    def _normalize_overwrite(self, overwrite):
+        """Validate the overwrite of a run against the template.
+
+        :param overwrite: dict such as ``{'L1': {'partner_id': 1, 'amount':
+            10}}``, or the same as JSON or as a Python literal
+        :return: dict mapping the sequence of the overwritten lines to their
+            wizard line values, ``amount`` being the balance of journal
+            entries or the price of invoice lines
+        """
+        self.ensure_one()
+        if not overwrite:
+            return {}
+        if isinstance(overwrite, str):
+            try:
+                overwrite = json.loads(overwrite)
+            except ValueError:
+                try:
+                    overwrite = literal_eval(overwrite)
+                except (SyntaxError, ValueError) as err:
+                    raise ValidationError(
+                        _("Overwrite value must be a valid python dict")
+                    ) from err
+        if not isinstance(overwrite, dict):
+            raise ValidationError(_("Overwrite value must be a valid python dict"))
+        # First level keys must be L1, L2, ...
+        if any(not LINE_REFERENCE.match(str(key)) for key in overwrite):
+            raise ValidationError(_("Keys must be line sequence i.e. L1, L2, ..."))
+        line_keys, fields_types = self._get_overwrite_schema()
+        unknown = sorted(set(overwrite) - set(line_keys))
+        if unknown:
+            raise ValidationError(
+                _("Lines %(lines)s do not exist in template %(name)s")
+                % {"lines": ", ".join(unknown), "name": self.name}
+            )
+        # Second level keys must be valid keys
+        sequence2vals = {}
+        for key, line_overwrite in overwrite.items():
+            try:
+                invalid = set(line_overwrite.keys()) - set(fields_types)
+            except AttributeError as err:
+                raise ValidationError(_("Invalid dictionary: %s") % err) from err
+            if invalid:
+                raise ValidationError(
+                    _("Valid fields to overwrite are %s") % list(fields_types)
+                )
+            vals = {}
+            for name, value in line_overwrite.items():
+                field_name, types = fields_types[name]
+                if value is not False and (
+                    isinstance(value, bool) or not isinstance(value, types)
+                ):
+                    raise ValidationError(
+                        _("Invalid value %(value)r for %(field)s of %(line)s")
+                        % {"value": value, "field": name, "line": key}
+                    )
+                vals[field_name] = value
+            sequence2vals[line_keys[key]] = vals
+        return sequence2vals
+
+    def _check_formula_dependencies(self):
+        """Check that formulas only reference existing lines, without cycle"""
+        # read from the records, the snapshot may not be up to date yet
+        for template in self:
+            references = {}
+            input_sequences = []
+            for line in template.line_ids:
+                if line.type != "computed":
+                    input_sequences.append(line.sequence)
+                    continue
+                try:
+                    references[line.sequence] = compile_formula(line.python_code)[1]
+                except (SyntaxError, ValueError):
+                    # reported by _check_python_code of the line
+                    continue
+            try:
+                sort_formulas(references, input_sequences)
+            except ValueError as err:
+                raise ValidationError(
+                    _("Invalid formulas on template %(name)s: %(error)s")
+                    % {"name": template.name, "error": err}
+                ) from err
+
+    def _get_dependent_formulas(self, sequences):
+        """Return the computed lines depending on ``sequences``, directly or
+        through other computed lines.
+
+        :param sequences: sequences of the changed lines
+        :return: list of the dependent computed lines sequences, in evaluation
+            order
+        """
+        changed = set(sequences)
+        dependents = []
+        for sequence, _code, references in self._get_formula_program():
+            if not references.isdisjoint(changed):
+                dependents.append(sequence)
+                changed.add(sequence)
+        return dependents
+
+    @contextmanager
+    def _formula_errors(self, sequence):
+        """Raise the errors of the evaluation of the formula of the line
+        ``sequence`` as ``UserError``, for both ``_compute_formula_amounts``
+        and ``_compute_formula_amounts_batch``"""
+        try:
+            yield
+        except NameError as err:
+            raise UserError(
+                _(
+                    "Impossible to compute the formula of line with sequence "
+                    "%s. Check that the lines used in the formula really "
+                    "exists."
+                )
+                % sequence
+            ) from err
+        except (ArithmeticError, TypeError) as err:
+            raise UserError(
+                _(
+                    "Impossible to compute the formula of line with sequence "
+                    "%(sequence)s: %(error)s"
+                )
+                % {"sequence": sequence, "error": err}
+            ) from err
+
+    def _compute_formula_amounts(self, sequence2amount, sequences=None):
+        """Evaluate the computed lines of the template.
+
+        :param sequence2amount: dict mapping the sequence of the input lines
+            to their amount, updated in place with the computed lines amounts
+            rounded in the currency of the company
+        :param sequences: sequences of the computed lines to evaluate, all of
+            them by default. The amounts of the other lines referenced by their
+            formulas must be in ``sequence2amount``.
+        :return: ``sequence2amount``
+        """
+        self.ensure_one()
+        currency = self.company_id.currency_id or self.env.company.currency_id
+        values = {"L%d" % seq: amount for seq, amount in sequence2amount.items()}
+        # the code only contains whitelisted nodes, see compile_formula
+        globals_dict = {"__builtins__": {}, **FORMULA_FUNCTIONS}
+        if sequences is not None:
+            sequences = set(sequences)
+        for sequence, code, _references in self._get_formula_program():
+            if sequences is not None and sequence not in sequences:
+                continue
+            with self._formula_errors(sequence):
+                amount = eval(code, globals_dict, values)  # pylint: disable=eval-used
+            amount = currency.round(amount)
+            sequence2amount[sequence] = amount
+            values["L%d" % sequence] = amount
+        return sequence2amount
+
+    def _compute_formula_amounts_batch(self, rows):
+        """Evaluate the computed lines of the template for many runs at once.
+
+        With NumPy, each formula is evaluated once on the columns of the input
+        amounts of all the runs, instead of once per run.
+
+        :param rows: list of dicts mapping the sequence of the input lines to
+            their amount, one per run
+        :return: list of dicts, one per run, with the input and computed lines
+            amounts as ``_compute_formula_amounts`` returns them
+        """
+        self.ensure_one()
+        if numpy is None or len(rows) < 2:
+            return [self._compute_formula_amounts(dict(row)) for row in rows]
+        size = len(rows)
+        currency = self.company_id.currency_id or self.env.company.currency_id
+        sequences = set().union(*rows)
+        columns = {
+            sequence: numpy.fromiter((row[sequence] for row in rows), float, size)
+            for sequence in sequences
+        }
+        values = {"L%d" % sequence: column for sequence, column in columns.items()}
+        globals_dict = {"__builtins__": {}, **VECTOR_FORMULA_FUNCTIONS}
+        for sequence, code, _references in self._get_formula_program():
+            with self._formula_errors(sequence), numpy.errstate(all="ignore"):
+                column = eval(code, globals_dict, values)  # pylint: disable=eval-used
+                column = numpy.broadcast_to(numpy.asarray(column, float), (size,))
+                if not numpy.isfinite(column).all():
+                    raise ZeroDivisionError(_("division by zero"))
+            column = _round_column(column, currency.rounding)
+            columns[sequence] = column
+            values["L%d" % sequence] = column
+        lists = {sequence: column.tolist() for sequence, column in columns.items()}
+        return [
+            {sequence: amounts[index] for sequence, amounts in lists.items()}
+            for index in range(size)
+        ]
+
+    @contextmanager
+    def _track_run(self, operation, size=0):
+        """Measure a run of the template and its phases.
+
+        The measures are logged as a JSON record and, with the system
+        parameter ``account_move_template.stats``, stored as an
+        ``account.move.template.stat``. With ``account_move_template.profile``,
+        the run is profiled and runs slower than
+        ``account_move_template.profile_threshold`` seconds dump their profile
+        in ``account_move_template.profile_dir``.
+
+        Runs started while another one is tracked are measured as a phase of
+        the latter.
+        """
+        self.ensure_one()
+        if get_tracker() is not None:
+            with track_phase(operation):
+                yield
+            return
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        profile = None
+        if get_param("account_move_template.profile"):
+            profile = cProfile.Profile()
+        tracker = RunTracker(self.env.cr)
+        set_tracker(tracker)
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            set_tracker(None)
+        duration = time.perf_counter() - start
+        record = {
+            "template_id": self.id,
+            "operation": operation,
+            "size": size,
+            "duration": round(duration, 6),
+            "query_count": self.env.cr.sql_log_count - queries,
+            "phases": {
+                name: {
+                    "seconds": round(phase["seconds"], 6),
+                    "queries": phase["queries"],
+                }
+                for name, phase in tracker.phases.items()
+            },
+        }
+        _logger.info("account_move_template run: %s", json.dumps(record))
+        if get_param("account_move_template.stats"):
+            self.env["account.move.template.stat"].sudo().create(record)
+        threshold = float(get_param("account_move_template.profile_threshold", 5))
+        if profile and duration >= threshold:
+            path = os.path.join(
+                get_param("account_move_template.profile_dir")
+                or tempfile.gettempdir(),
+                "account_move_template_%s_%s_%d.prof"
+                % (operation, self.id, time.time()),
+            )
+            profile.dump_stats(path)
+            _logger.info(
+                "Slow %s of template %s profiled in %s", operation, self.id, path
+            )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(SNAPSHOT_FIELDS).intersection(vals):
+            self._invalidate_snapshot()
+        return res
+
     def copy(self, default=None):
         """Override to set a different name when copying a template"""
         self.ensure_one()
@@ -118,29 +864,60 @@ class AccountMoveTemplate(models.Model):
             "res_id": wizard.id,
         }
 
-    def generate_journal_entry(self):
-        self.ensure_one()
-
-        context = self.env.context
-        partner_id = context.get("default_partner_id") or self.partner_id.id
-        date = context.get("default_date") or fields.Date.context_today(self)
-        ref = context.get("default_ref") or self.ref
-        amount = context.get("amount")  # si aplica en pagos automáticos
-        overwrite = context.get("overwrite")
+    def _prepare_run_vals(self, params):
+        """Return the values of a run wizard for one set of run parameters.
 
-        wizard_vals = {
+        :param params: dict with optional ``date``, ``partner_id``, ``ref``,
+            ``amount`` and ``overwrite`` keys, or a tuple of these values in
+            that order. The overwrite may be a dict or its text, see
+            ``_normalize_overwrite``.
+        """
+        self.ensure_one()
+        params = self._get_run_params(params)
+        vals = {
             "template_id": self.id,
-            "partner_id": partner_id,
-            "date": date,
-            "ref": ref,
+            "partner_id": params.get("partner_id") or self.partner_id.id,
+            "date": params.get("date") or fields.Date.context_today(self),
+            "ref": params.get("ref") or self.ref,
         }
-
-        if amount and self.is_payment:
-            wizard_vals["payment_amount"] = amount
+        if params.get("amount"):
+            vals["amount"] = params["amount"]
+        overwrite = params.get("overwrite")
         if overwrite:
-            wizard_vals["overwrite"] = overwrite
+            vals["overwrite"] = (
+                overwrite if isinstance(overwrite, str) else json.dumps(overwrite)
+            )
+        return vals
+
+    @api.model
+    def _get_run_params(self, params):
+        """Return run parameters given as a tuple as a dict"""
+        if isinstance(params, dict):
+            return params
+        return dict(zip(RUN_PARAMS, params))
+
+    def generate_journal_entry(self, persist=True):
+        """Open the run wizard, prefilled from the context.
 
-        wizard = self.env["account.move.template.run"].create(wizard_vals)
+        :param persist: if False, for callers without user interface, the run
+            wizard only lives in memory and the entry is created right away
+        :return: the action of the wizard, or the created move or payment
+        """
+        self.ensure_one()
+
+        context = self.env.context
+        params = {
+            "partner_id": context.get("default_partner_id"),
+            "date": context.get("default_date"),
+            "ref": context.get("default_ref"),
+            "amount": context.get("amount"),  # si aplica en pagos automáticos
+            "overwrite": context.get("overwrite"),
+        }
+        if not persist:
+            return self._generate_entries([params])
+        wizard = self.env["account.move.template.run"].create(
+            self._prepare_run_vals(params)
+        )
         wizard.load_lines()
 
         return {
@@ -151,3 +928,330 @@ class AccountMoveTemplate(models.Model):
             "target": "new",
             "res_id": wizard.id,
         }
+
+    def _get_payment_journal(self, company):
+        self.ensure_one()
+        journal = self._get_run_journal(company)
+        if not journal:
+            raise UserError(_("No valid journal found for this payment."))
+        return journal
+
+    def generate_payments(self, params_list):
+        """Create and post one payment per set of run parameters, without wizard.
+
+        The journal is resolved once for the whole batch, the payments are
+        created with a single batched ``create`` and posted together.
+
+        :param params_list: list of run parameters, see ``_prepare_run_vals``,
+            of which the date, the partner and the amount are used
+        :return: the created ``account.payment`` recordset
+        """
+        self.ensure_one()
+        if not self.is_payment:
+            raise UserError(
+                _("Template %s generates journal entries, not payments.") % self.name
+            )
+        company = self.env.company
+        TemplateRun = self.env["account.move.template.run"]
+        with self._track_run("generate_payments", len(params_list)):
+            journal = self._get_payment_journal(company)
+            vals_list = [
+                TemplateRun.new(self._prepare_run_vals(params))._prepare_payment_vals(
+                    journal
+                )
+                for params in params_list
+            ]
+            if self.post_in_background:
+                for vals in vals_list:
+                    vals["template_post_queued"] = True
+            with track_phase("payment_create"):
+                payments = (
+                    self.env["account.payment"].with_company(company).create(vals_list)
+                )
+            if not self.post_in_background:
+                with track_phase("post"):
+                    payments.action_post()
+        self._trigger_post_queued(payments)
+        return payments
+
+    def dispatch_generation(self, params_list, chunk_size=None):
+        """Generate the entries of many runs in background, by chunks.
+
+        The run parameters are split in chunks of ``chunk_size`` runs, or of
+        the system parameter ``account_move_template.job_chunk_size`` (500),
+        each chunk being generated and committed in its own transaction by the
+        generation cron, see ``account.move.template.job``. The state and
+        error of each chunk is reported on the template.
+
+        :param params_list: list of run parameters, see ``_prepare_run_vals``
+        :return: the ``account.move.template.job`` of the chunks
+        """
+        self.ensure_one()
+        if not chunk_size:
+            chunk_size = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("account_move_template.job_chunk_size", 500)
+            )
+        batch = uuid.uuid4().hex
+        params_list = [self._prepare_job_params(params) for params in params_list]
+        jobs = self.env["account.move.template.job"].create(
+            [
+                {
+                    "template_id": self.id,
+                    "company_id": self.env.company.id,
+                    "batch": batch,
+                    "sequence": index,
+                    "params": params_list[start : start + chunk_size],
+                    "size": len(params_list[start : start + chunk_size]),
+                }
+                for index, start in enumerate(range(0, len(params_list), chunk_size))
+            ]
+        )
+        jobs._trigger_generation_crons()
+        return jobs
+
+    @api.model
+    def _prepare_job_params(self, params):
+        """Return run parameters as a JSON serializable dict"""
+        params = dict(self._get_run_params(params))
+        if isinstance(params.get("date"), datetime.date):
+            params["date"] = fields.Date.to_string(params["date"])
+        return params
+
+    def generate_entries_for_companies(self, companies, params_list):
+        """Generate the entries of the same runs in each of ``companies``.
+
+        The journals of all the companies are looked for at once, then the
+        entries of each company are generated with one batched ``create``, see
+        ``generate_moves`` and ``generate_payments``. A company failing does
+        not prevent the others from being generated.
+
+        :param companies: ``res.company`` recordset
+        :param params_list: list of run parameters, see ``_prepare_run_vals``
+        :return: list of dicts, one per company, with the ``company_id``, the
+            ``count`` and ``record_ids`` of the generated entries, and the
+            ``error`` of the company if any
+        """
+        self.ensure_one()
+        template = self.with_context(
+            template_journal_ids=self._get_journal_ids_by_company(companies)
+        )
+        summary = []
+        with self._track_run("generate_entries_for_companies", len(companies)):
+            for company in companies:
+                result = {"company_id": company.id, "count": 0, "record_ids": []}
+                try:
+                    with self.env.cr.savepoint():
+                        records = template.with_company(company)._generate_entries(
+                            params_list
+                        )
+                except (UserError, ValidationError) as err:
+                    result["error"] = str(err)
+                else:
+                    result.update(count=len(records), record_ids=records.ids)
+                summary.append(result)
+        return summary
+
+    def _generate_entries(self, params_list):
+        """Generate the moves or payments of the template, depending on its type"""
+        self.ensure_one()
+        if self.is_payment:
+            return self.generate_payments(params_list)
+        return self.generate_moves(params_list)
+
+    def generate_moves(self, params_list):
+        """Create one journal entry per set of run parameters, without wizard.
+
+        The run wizards only live in memory: all the move values are prepared
+        first, the formulas being evaluated for all runs at once, and the
+        moves are created with a single batched ``create``.
+
+        :param params_list: list of run parameters, see ``_prepare_run_vals``
+        :return: the created ``account.move`` recordset
+        """
+        self._check_generates_moves()
+        company = self.env.company
+        with self._track_run("generate_moves", len(params_list)):
+            vals_list = self._prepare_moves_vals(params_list, company)
+            if self.post_in_background:
+                for vals in vals_list:
+                    vals["template_post_queued"] = True
+            with track_phase("move_create"):
+                moves = (
+                    self.env["account.move"]
+                    .with_company(company)
+                    .with_context(default_move_type=self.move_type)
+                    .create(vals_list)
+                )
+            with track_phase("taxes"):
+                self._compute_moves_tax_ids(moves)
+        self._trigger_post_queued(moves)
+        return moves
+
+    def preview_moves(self, params_list):
+        """Compute the journal entries of the runs without creating anything.
+
+        The values are the ones ``generate_moves`` would create, formulas
+        and accounts included, so that planned runs can be checked first.
+
+        :param params_list: list of run parameters, see ``_prepare_run_vals``
+        :return: list of dicts, one per run, with the ``move`` values, the
+            values of its ``lines``, their ``balance`` (the sum of the line
+            balances of journal entries), whether the entry is ``balanced``
+            and the ``missing_accounts`` labels of the lines without account
+        """
+        self._check_generates_moves()
+        company = self.env.company
+        currency = company.currency_id
+        previews = []
+        for move_vals in self._prepare_moves_vals(params_list, company):
+            lines = [vals for _command, _id, vals in move_vals.pop("line_ids")]
+            balance = currency.round(sum(vals.get("balance", 0.0) for vals in lines))
+            previews.append(
+                {
+                    "move": move_vals,
+                    "lines": lines,
+                    "balance": balance,
+                    "balanced": move_vals["move_type"] != "entry"
+                    or currency.is_zero(balance),
+                    "missing_accounts": [
+                        vals["name"] for vals in lines if not vals["account_id"]
+                    ],
+                }
+            )
+        return previews
+
+    def _check_generates_moves(self):
+        self.ensure_one()
+        if self.is_payment:
+            raise UserError(
+                _(
+                    "Template %s generates payments, not journal entries: use "
+                    "generate_payments instead."
+                )
+                % self.name
+            )
+
+    def _prepare_moves_vals(self, params_list, company):
+        """Return the values of the journal entries of the runs, see
+        ``generate_moves``.
+
+        The values only depend on the version of the template snapshot, the
+        company and the partner, amount and overwrite of the run: they are
+        kept in a LRU cache per worker, and only the date and the reference
+        are set on a cache hit. The cache holds at most the number of move
+        lines of the system parameter
+        ``account_move_template.move_vals_cache_lines`` (100000), 0 disabling
+        it. Changing the template, its lines, an account or a journal builds a
+        new snapshot, the values of the previous one being no longer used.
+        """
+        max_lines = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.move_vals_cache_lines", 100000)
+        )
+        version = self._get_snapshot().version
+        vals_list = [None] * len(params_list)
+        keys = []
+        missing = []
+        for index, params in enumerate(params_list):
+            run_vals = self._prepare_run_vals(params)
+            key = (
+                self.env.cr.dbname,
+                self.id,
+                version,
+                company.id,
+                run_vals["partner_id"] or False,
+                run_vals.get("amount", 0.0),
+                run_vals.get("overwrite", False),
+            )
+            keys.append(key)
+            cached_vals = _move_vals_cache.get(key) if max_lines else None
+            if cached_vals is None:
+                missing.append(index)
+                continue
+            vals = copy.deepcopy(cached_vals)
+            vals["date"] = fields.Date.to_date(run_vals["date"])
+            vals["ref"] = run_vals["ref"]
+            vals_list[index] = vals
+        if missing:
+            computed = self._compute_moves_vals(
+                [params_list[index] for index in missing], company
+            )
+            for index, vals in zip(missing, computed):
+                if max_lines:
+                    _move_vals_cache.set(keys[index], copy.deepcopy(vals), max_lines)
+                vals_list[index] = vals
+        return vals_list
+
+    def _compute_moves_vals(self, params_list, company):
+        TemplateRun = self.env["account.move.template.run"]
+        wizards_lines_vals = []
+        # runs often share their overwrite, it is validated once
+        overwrites = {}
+        with track_phase("prepare_wizard_lines"):
+            for params in params_list:
+                params = self._get_run_params(params)
+                run_vals = self._prepare_run_vals(params)
+                overwrite = run_vals.get("overwrite")
+                if overwrite not in overwrites:
+                    overwrites[overwrite] = self._normalize_overwrite(
+                        params.get("overwrite")
+                    )
+                wizard = TemplateRun.new(run_vals)
+                wizard.line_ids = [
+                    Command.create(vals)
+                    for vals in wizard._prepare_wizard_lines(overwrites[overwrite])
+                ]
+                wizards_lines_vals.append((wizard, wizard._prepare_move_lines_vals()))
+        # formulas are evaluated for all the runs at once
+        with track_phase("formulas"):
+            amounts_list = self._compute_formula_amounts_batch(
+                [
+                    wizard._get_input_amounts(lines_vals)
+                    for wizard, lines_vals in wizards_lines_vals
+                ]
+            )
+        with track_phase("prepare_move_vals"):
+            return [
+                wizard._assemble_move_vals(company, lines_vals, sequence2amount)
+                for (wizard, lines_vals), sequence2amount in zip(
+                    wizards_lines_vals, amounts_list
+                )
+            ]
+
+    @api.model
+    def _compute_moves_tax_ids(self, moves):
+        """Set the default taxes of the invoice lines of ``moves``.
+
+        Same as ``_compute_tax_ids`` on the lines, except that the taxes are
+        computed once per product, account, fiscal position, move type and
+        company, and assigned with one write per set of taxes.
+        """
+        no_taxes = self.env["account.tax"]
+        taxes_cache = {}
+        lines_by_taxes = defaultdict(lambda: self.env["account.move.line"])
+        for line in moves.invoice_line_ids:
+            if line.display_type in ("line_section", "line_note", "payment_term"):
+                continue
+            if line.is_imported:
+                continue
+            # don't remove existing taxes if the account has no explicit taxes
+            if not line.product_id and (
+                line.display_type == "discount"
+                or (line.tax_ids and not line.account_id.tax_ids)
+            ):
+                continue
+            key = (
+                line.product_id.id,
+                line.account_id.id,
+                line.move_id.fiscal_position_id.id,
+                line.move_id.move_type,
+                line.company_id.id,
+            )
+            if key not in taxes_cache:
+                taxes_cache[key] = line._get_computed_taxes() or no_taxes
+            lines_by_taxes[taxes_cache[key]] |= line
+        for taxes, lines in lines_by_taxes.items():
+            lines.tax_ids = taxes
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from odoo import api, models
+
+
+class AccountMoveTemplateCronMixin(models.AbstractModel):
+    _name = "account.move.template.cron.mixin"
+    _description = "Time Limited Cron of Journal Entry Templates"
+
+    @api.model
+    def _run_until_deadline(self, cron_xmlid, time_limit_param, process):
+        """Call ``process(deadline)`` with the deadline of the system parameter
+        ``time_limit_param``, in seconds (60 by default).
+
+        ``process`` commits its progress as it goes, see ``_commit_progress``,
+        and returns False when it stops on the deadline. The cron
+        ``cron_xmlid`` then triggers itself again, the remaining work being
+        done by the next call.
+        """
+        time_limit = int(
+            self.env["ir.config_parameter"].sudo().get_param(time_limit_param, 60)
+        )
+        if not process(time.monotonic() + time_limit):
+            self._trigger_cron(cron_xmlid)
+
+    @api.model
+    def _trigger_cron(self, cron_xmlid):
+        """Trigger the cron ``cron_xmlid`` to run again as soon as possible"""
+        self.env.ref(cron_xmlid)._trigger()
+
+    def _commit_progress(self, deadline=None):
+        """Commit the progress of a cron, except in tests.
+
+        :return: False if ``deadline`` is reached, True otherwise
+        """
+        if not getattr(threading.current_thread(), "testing", False):
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+        return deadline is None or time.monotonic() <= deadline
@@ -0,0 +1,347 @@
+import base64
+import csv
+import io
+import itertools
+import logging
+import tempfile
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools.translate import _
+
+from .account_move_template_line import LINE_REFERENCE
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import openpyxl
+except ImportError:
+    _logger.debug("Cannot import openpyxl, only CSV files can be imported.")
+    openpyxl = None
+
+# Columns of the run parameters, the other ones being line overwrites named
+# L<sequence>.<key>, e.g. L1.amount
+IMPORT_COLUMNS = ("partner_id", "partner_ref", "date", "ref", "amount")
+
+
+class AccountMoveTemplateImport(models.Model):
+    _name = "account.move.template.import"
+    _description = "Journal Entry Template File Import"
+    _inherit = ["account.move.template.cron.mixin"]
+    _order = "id desc"
+
+    template_id = fields.Many2one(
+        comodel_name="account.move.template",
+        string="Move Template",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    company_id = fields.Many2one(
+        comodel_name="res.company",
+        string="Company",
+        required=True,
+        default=lambda self: self.env.company,
+    )
+    file = fields.Binary(
+        required=True,
+        attachment=True,
+        help="CSV or XLSX file with one run per row. Columns are partner_id "
+        "or partner_ref, date, ref, amount and line overwrites such as "
+        "L1.amount or L2.partner_id.",
+    )
+    filename = fields.Char()
+    state = fields.Selection(
+        selection=[
+            ("draft", "Draft"),
+            ("running", "Running"),
+            ("done", "Done"),
+        ],
+        default="draft",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    row_count = fields.Integer(
+        string="Processed Rows",
+        readonly=True,
+        help="Number of rows already processed, the import resuming after them",
+    )
+    generated_count = fields.Integer(string="Generated", readonly=True)
+    error_count = fields.Integer(string="Failed Rows", readonly=True)
+    error_ids = fields.One2many(
+        comodel_name="account.move.template.import.error",
+        inverse_name="import_id",
+        string="Errors",
+        readonly=True,
+    )
+    error_file = fields.Binary(string="Error Report", attachment=True, readonly=True)
+    error_filename = fields.Char(readonly=True)
+
+    def action_start(self):
+        for record in self:
+            if record.state != "draft":
+                continue
+            record._check_file()
+            record.state = "running"
+        self.env.ref("account_move_template.ir_cron_run_imports")._trigger()
+
+    def _check_file(self):
+        self.ensure_one()
+        if self._get_file_type() == "xlsx" and openpyxl is None:
+            raise UserError(_("The openpyxl library is needed to import XLSX files."))
+        header = next(self._read_file(), None)
+        if not header:
+            raise UserError(_("The file %s is empty.") % self.filename)
+        header = [str(column).strip() for column in header]
+        unknown = [
+            column
+            for column in header
+            if column not in IMPORT_COLUMNS and not self._parse_line_column(column)
+        ]
+        if unknown:
+            raise UserError(
+                _(
+                    "Unknown columns %(columns)s: valid columns are %(valid)s and "
+                    "line overwrites such as L1.amount"
+                )
+                % {"columns": ", ".join(unknown), "valid": ", ".join(IMPORT_COLUMNS)}
+            )
+
+    def _get_file_type(self):
+        return "xlsx" if (self.filename or "").lower().endswith(".xlsx") else "csv"
+
+    def _read_file(self):
+        """Iterate on the rows of the file, the first one being the header.
+
+        Rows are read one at a time, only the file itself is loaded.
+        """
+        content = io.BytesIO(base64.b64decode(self.with_context(bin_size=False).file))
+        if self._get_file_type() == "xlsx":
+            workbook = openpyxl.load_workbook(content, read_only=True, data_only=True)
+            try:
+                for row in workbook.active.iter_rows(values_only=True):
+                    yield ["" if value is None else value for value in row]
+            finally:
+                workbook.close()
+        else:
+            yield from csv.reader(
+                io.TextIOWrapper(content, encoding="utf-8-sig", newline="")
+            )
+
+    def _read_rows(self):
+        """Iterate on (row number, dict of the non empty cells by column)"""
+        rows = self._read_file()
+        header = [str(column).strip() for column in next(rows, [])]
+        for row_number, row in enumerate(rows, start=2):
+            yield row_number, {
+                column: value.strip() if isinstance(value, str) else value
+                for column, value in zip(header, row)
+                if value not in ("", None)
+            }
+
+    @api.model
+    def _parse_line_column(self, column):
+        """Return (line key, overwrite key) of a L<sequence>.<key> column"""
+        line_key, _dot, key = column.partition(".")
+        if not key or not LINE_REFERENCE.match(line_key):
+            return None
+        return line_key, key
+
+    def _prepare_params(self, row, partner_ids):
+        """Return the run parameters of a row, see ``_prepare_run_vals``
+
+        :param partner_ids: dict mapping partner internal references to ids
+        """
+        params = {}
+        if "partner_ref" in row:
+            if str(row["partner_ref"]) not in partner_ids:
+                raise ValueError(_("Unknown partner %s") % row["partner_ref"])
+            params["partner_id"] = partner_ids[str(row["partner_ref"])]
+        elif "partner_id" in row:
+            params["partner_id"] = int(row["partner_id"])
+        if "date" in row:
+            params["date"] = fields.Date.to_string(fields.Date.to_date(row["date"]))
+        if "ref" in row:
+            params["ref"] = str(row["ref"])
+        if "amount" in row:
+            params["amount"] = float(row["amount"])
+        overwrite = {}
+        for column, value in row.items():
+            line_column = self._parse_line_column(column)
+            if not line_column:
+                continue
+            line_key, key = line_column
+            if key in ("name", "note"):
+                value = str(value)
+            elif key == "partner_id":
+                value = int(value)
+            else:
+                value = float(value)
+            overwrite.setdefault(line_key, {})[key] = value
+        if overwrite:
+            params["overwrite"] = overwrite
+        return params
+
+    def _get_partner_ids(self, rows):
+        """Return the ids of the partners referenced by ``rows``, by reference"""
+        refs = {
+            str(row["partner_ref"]) for _number, row in rows if "partner_ref" in row
+        }
+        if not refs:
+            return {}
+        partners = self.env["res.partner"].search_read(
+            [("ref", "in", list(refs))], ["ref"], order="id"
+        )
+        partner_ids = {}
+        for partner in partners:
+            partner_ids.setdefault(partner["ref"], partner["id"])
+        return partner_ids
+
+    def _run_chunk(self, rows):
+        """Generate the entries of a chunk of rows.
+
+        The chunk is generated at once. If that fails, its rows are generated
+        one by one to find out the failing ones.
+
+        :return: tuple (number of generated entries, list of [row number,
+            error] of the failed rows)
+        """
+        template = self.template_id.with_company(self.company_id)
+        partner_ids = self._get_partner_ids(rows)
+        params_list = []
+        errors = []
+        for row_number, row in rows:
+            try:
+                params_list.append((row_number, self._prepare_params(row, partner_ids)))
+            except (TypeError, ValueError) as err:
+                errors.append([row_number, str(err)])
+        try:
+            with self.env.cr.savepoint():
+                records = template._generate_entries(
+                    [params for _number, params in params_list]
+                )
+            return len(records), errors
+        except Exception:
+            _logger.info(
+                "Chunk of import %s failed, generating its rows one by one", self.id
+            )
+        generated = 0
+        for row_number, params in params_list:
+            try:
+                with self.env.cr.savepoint():
+                    generated += len(template._generate_entries([params]))
+            except Exception as err:
+                errors.append([row_number, str(err)])
+        errors.sort()
+        return generated, errors
+
+    def _process(self, chunk_size, deadline):
+        """Process the rows of the file by chunks, from the last checkpoint.
+
+        The progress is committed after each chunk, so that an import
+        interrupted by a crash or by ``deadline`` resumes after the last
+        committed chunk.
+
+        :return: True if the import is done, False if the deadline was reached
+            before
+        """
+        self.ensure_one()
+        rows = itertools.islice(self._read_rows(), self.row_count, None)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            generated, errors = self._run_chunk(chunk)
+            self.env["account.move.template.import.error"].create(
+                [
+                    {"import_id": self.id, "row_number": row_number, "error": error}
+                    for row_number, error in errors
+                ]
+            )
+            self.write(
+                {
+                    "row_count": self.row_count + len(chunk),
+                    "generated_count": self.generated_count + generated,
+                    "error_count": self.error_count + len(errors),
+                }
+            )
+            if not self._commit_progress(deadline):
+                return False
+        self.write({"state": "done", **self._prepare_error_file()})
+        self._commit_progress()
+        return True
+
+    def _prepare_error_file(self):
+        """Return the values of the CSV report of the failed rows, which are
+        the rows of the file with an additional error column.
+
+        The rows of the file and the errors are both read in the order of the
+        rows, the report being written to a temporary file as they match.
+        """
+        if not self.error_count:
+            return {"error_file": False, "error_filename": False}
+        with tempfile.TemporaryFile() as output:
+            text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+            writer = csv.writer(text)
+            errors = self._iter_errors()
+            next_error = next(errors, None)
+            rows = self._read_file()
+            writer.writerow([*next(rows), "error"])
+            for row_number, row in enumerate(rows, start=2):
+                if next_error is None:
+                    break
+                if row_number == next_error[0]:
+                    writer.writerow([*row, next_error[1]])
+                    next_error = next(errors, None)
+            text.flush()
+            text.detach()
+            output.seek(0)
+            error_file = base64.b64encode(output.read())
+        return {
+            "error_file": error_file,
+            "error_filename": "%s_errors.csv"
+            % (self.filename or "import").rsplit(".", 1)[0],
+        }
+
+    def _iter_errors(self, page_size=1000):
+        """Iterate on (row number, error) of the failed rows, by row number,
+        the errors being read a page at a time"""
+        Error = self.env["account.move.template.import.error"]
+        last_row_number = 0
+        while True:
+            page = Error.search_read(
+                [("import_id", "=", self.id), ("row_number", ">", last_row_number)],
+                ["row_number", "error"],
+                order="row_number",
+                limit=page_size,
+            )
+            Error.invalidate_model()
+            for vals in page:
+                yield vals["row_number"], vals["error"]
+            if len(page) < page_size:
+                return
+            last_row_number = page[-1]["row_number"]
+
+    @api.model
+    def _cron_run_imports(self):
+        """Process the running imports, within the time limit of
+        ``_run_until_deadline``"""
+        chunk_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.import_chunk_size", 500)
+        )
+        self._run_until_deadline(
+            "account_move_template.ir_cron_run_imports",
+            "account_move_template.import_time_limit",
+            lambda deadline: self._process_running(chunk_size, deadline),
+        )
+
+    @api.model
+    def _process_running(self, chunk_size, deadline):
+        """Process the running imports one after the other, see ``_process``"""
+        for record in self.search([("state", "=", "running")], order="id"):
+            record = record.with_company(record.company_id).with_user(
+                record.create_uid
+            )
+            if not record._process(chunk_size, deadline):
+                return False
+        return True
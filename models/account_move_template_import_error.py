@@ -0,0 +1,17 @@
+from odoo import fields, models
+
+
+class AccountMoveTemplateImportError(models.Model):
+    _name = "account.move.template.import.error"
+    _description = "Failed Row of a Journal Entry Template File Import"
+    _order = "import_id, row_number"
+
+    import_id = fields.Many2one(
+        comodel_name="account.move.template.import",
+        string="Import",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    row_number = fields.Integer(required=True, readonly=True)
+    error = fields.Text(readonly=True)
@@ -0,0 +1,194 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+GENERATION_CRON = "account_move_template.ir_cron_run_generation_jobs"
+
+
+class AccountMoveTemplateJob(models.Model):
+    _name = "account.move.template.job"
+    _description = "Journal Entry Template Generation Chunk"
+    _inherit = ["account.move.template.cron.mixin"]
+    _order = "id"
+
+    template_id = fields.Many2one(
+        comodel_name="account.move.template",
+        string="Move Template",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    company_id = fields.Many2one(
+        comodel_name="res.company",
+        string="Company",
+        required=True,
+    )
+    batch = fields.Char(
+        required=True,
+        index=True,
+        help="Identifier shared by the chunks of one generation",
+    )
+    sequence = fields.Integer(help="Position of the chunk in its generation")
+    params = fields.Json(help="Run parameters of the chunk")
+    size = fields.Integer(help="Number of runs of the chunk")
+    state = fields.Selection(
+        selection=[
+            ("pending", "Pending"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    result_count = fields.Integer(string="Generated")
+    error = fields.Text()
+
+    def action_retry(self):
+        self.filtered(lambda job: job.state == "failed").write(
+            {"state": "pending", "error": False}
+        )
+        self._trigger_generation_crons()
+
+    @api.model
+    def _get_generation_crons(self):
+        """Return the generation cron and its copies.
+
+        A cron is run by one cron worker at a time: to process the chunks in
+        several processes, hence on several cores, the scheduled action is
+        duplicated, each copy claiming the chunks the others are not
+        processing, see ``_claim_pending_job``.
+        """
+        cron = self.env.ref(GENERATION_CRON)
+        return cron | self.env["ir.cron"].sudo().search([("code", "=", cron.code)])
+
+    @api.model
+    def _trigger_generation_crons(self):
+        for cron in self._get_generation_crons():
+            cron._trigger()
+
+    @api.model
+    def _trigger_cron(self, cron_xmlid):
+        if cron_xmlid == GENERATION_CRON:
+            self._trigger_generation_crons()
+        else:
+            super()._trigger_cron(cron_xmlid)
+
+    def _run(self):
+        """Generate the entries of the chunk, recording the failure if any"""
+        self.ensure_one()
+        template = self.template_id.with_company(self.company_id).with_user(
+            self.create_uid
+        )
+        try:
+            with self.env.cr.savepoint():
+                records = template._generate_entries(self.params)
+        except Exception as err:
+            _logger.exception(
+                "Chunk %s of generation %s of template %s failed",
+                self.sequence,
+                self.batch,
+                self.template_id.id,
+            )
+            self.write({"state": "failed", "error": str(err)})
+        else:
+            self.write(
+                {"state": "done", "result_count": len(records), "error": False}
+            )
+
+    @api.model
+    def _claim_pending_job(self):
+        """Lock a pending chunk no other transaction is processing"""
+        self.env.cr.execute(
+            """
+            SELECT id FROM account_move_template_job
+            WHERE state = 'pending'
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """
+        )
+        row = self.env.cr.fetchone()
+        return self.browse(row[0] if row else [])
+
+    @api.model
+    def _run_pending_jobs(self, deadline):
+        """Process pending chunks until there is none left or ``deadline``.
+
+        Each chunk is claimed, processed and committed in its own transaction,
+        so several transactions may call this concurrently.
+
+        :return: True if no chunk is pending, False if the deadline was
+            reached before
+        """
+        while job := self._claim_pending_job():
+            job._run()
+            if not self._commit_progress(deadline):
+                return False
+        return True
+
+    @api.model
+    def _run_pending_jobs_in_new_cursor(self, registry, uid, context, deadline):
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            return env["account.move.template.job"]._run_pending_jobs(deadline)
+
+    @api.model
+    def _cron_run_generation_jobs(self):
+        """Process the pending generation chunks.
+
+        The copies of the cron process the chunks in parallel, each one in
+        its own cron worker, see ``_get_generation_crons``. Within a cron,
+        with the system parameter ``account_move_template.job_workers``
+        greater than 1, the chunks are processed by as many threads, each one
+        with its own cursor and transaction. The threads overlap their waits
+        on the database, the Python code of the generation still running on
+        one core at a time. The chunks are processed within the time limit of
+        ``_run_until_deadline``.
+        """
+        workers = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.job_workers", 1)
+        )
+        self._run_until_deadline(
+            GENERATION_CRON,
+            "account_move_template.job_time_limit",
+            lambda deadline: self._run_pending_jobs_in_threads(workers, deadline),
+        )
+
+    @api.model
+    def _run_pending_jobs_in_threads(self, workers, deadline):
+        """Process the pending chunks with ``workers`` threads, see
+        ``_run_pending_jobs``"""
+        if workers <= 1:
+            return self._run_pending_jobs(deadline)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    self._run_pending_jobs_in_new_cursor,
+                    self.env.registry,
+                    self.env.uid,
+                    dict(self.env.context),
+                    deadline,
+                )
+                for _i in range(workers)
+            ]
+        return all([future.result() for future in futures])
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.job_retention_days", 30)
+        )
+        limit_date = fields.Datetime.now() - relativedelta(days=days)
+        self.search(
+            [("state", "=", "done"), ("create_date", "<", limit_date)]
+        ).unlink()
@@ -1,7 +1,137 @@
+import ast
+import heapq
+import re
+from collections import defaultdict, namedtuple
+
 from odoo import api, fields, models
 from odoo.exceptions import ValidationError
 from odoo.tools.translate import _
 
+# Functions a formula may call, besides referencing other lines as L<sequence>
+FORMULA_FUNCTIONS = {"abs": abs, "min": min, "max": max, "round": round}
+FORMULA_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Call,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.UAdd,
+    ast.USub,
+)
+LINE_REFERENCE = re.compile(r"^L(\d+)$")
+
+# Fields of the lines copied in the template snapshot, relational ones as ids
+SNAPSHOT_LINE_FIELDS = (
+    "id",
+    "sequence",
+    "type",
+    "name",
+    "partner_id",
+    "account_code",
+    "resolved_account_id",
+    "analytic_distribution",
+    "product_id",
+    "product_uom_id",
+    "quantity",
+    "price_unit",
+    "discount",
+    "balance",
+    "python_code",
+    "note",
+)
+TemplateLineSnapshot = namedtuple("TemplateLineSnapshot", SNAPSHOT_LINE_FIELDS)
+
+
+def compile_formula(formula):
+    """Parse and check the formula of a computed line.
+
+    Formulas are arithmetic expressions on numbers, references to other lines
+    (``L0``, ``L1``...) and the functions of ``FORMULA_FUNCTIONS``, which
+    makes the compiled code safe to evaluate without ``safe_eval``.
+
+    :return: tuple (code object, frozenset of the referenced sequences)
+    :raise SyntaxError: if the formula is not a valid expression
+    :raise ValueError: if the formula uses anything else than the above
+    """
+    tree = ast.parse((formula or "").strip(), mode="eval")
+    references = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, FORMULA_NODES):
+            raise ValueError(_("%s is not allowed") % type(node).__name__)
+        if isinstance(node, ast.Constant) and not isinstance(
+            node.value, (int, float)
+        ):
+            raise ValueError(_("%r is not a number") % node.value)
+        if isinstance(node, ast.Call) and (
+            not isinstance(node.func, ast.Name)
+            or node.func.id not in FORMULA_FUNCTIONS
+            or node.keywords
+        ):
+            raise ValueError(_("only %s can be called") % ", ".join(FORMULA_FUNCTIONS))
+        if isinstance(node, ast.Name):
+            match = LINE_REFERENCE.match(node.id)
+            if match:
+                references.add(int(match.group(1)))
+            elif node.id not in FORMULA_FUNCTIONS:
+                raise ValueError(_("unknown name %s") % node.id)
+    return compile(tree, "<formula>", "eval"), frozenset(references)
+
+
+def sort_formulas(references, input_sequences):
+    """Sort computed lines so that each one comes after the lines it uses.
+
+    :param references: dict mapping the sequence of each computed line to the
+        sequences referenced by its formula
+    :param input_sequences: sequences of the input lines of the template
+    :return: list of the computed lines sequences, in evaluation order, lower
+        sequences first when lines do not depend on each other
+    :raise ValueError: if a formula references an unknown line or if formulas
+        reference each other in a cycle
+    """
+    known_sequences = set(input_sequences) | set(references)
+    for sequence, line_references in sorted(references.items()):
+        unknown = line_references - known_sequences
+        if unknown:
+            raise ValueError(
+                _("line %(sequence)d references unknown lines %(lines)s")
+                % {
+                    "sequence": sequence,
+                    "lines": ", ".join("L%d" % seq for seq in sorted(unknown)),
+                }
+            )
+    dependents = defaultdict(list)
+    pending = {}
+    for sequence, line_references in references.items():
+        computed_references = line_references.intersection(references)
+        pending[sequence] = len(computed_references)
+        for reference in computed_references:
+            dependents[reference].append(sequence)
+    ready = [sequence for sequence, count in pending.items() if not count]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        sequence = heapq.heappop(ready)
+        order.append(sequence)
+        for dependent in dependents[sequence]:
+            pending[dependent] -= 1
+            if not pending[dependent]:
+                heapq.heappush(ready, dependent)
+    if len(order) != len(references):
+        cycle = sorted(set(references) - set(order))
+        raise ValueError(
+            _("lines %s reference each other")
+            % ", ".join("L%d" % seq for seq in cycle)
+        )
+    return order
+
 
 class AccountMoveTemplateLine(models.Model):
     _name = "account.move.template.line"
@@ -46,6 +176,15 @@ class AccountMoveTemplateLine(models.Model):
         help="When creating a new journal item an account having this prefix"
         "will be looked for",
     )
+    resolved_account_id = fields.Many2one(
+        comodel_name="account.account",
+        string="Resolved Account",
+        compute="_compute_resolved_account_id",
+        store=True,
+        ondelete="set null",
+        help="Account of the company of the template matching the prefix, used "
+        "by the runs in that company instead of looking for it",
+    )
     name = fields.Char(string="Label")
     sequence = fields.Integer(default=10)
     type = fields.Selection(
@@ -95,14 +234,112 @@ class AccountMoveTemplateLine(models.Model):
         ),
     ]
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines.template_id._invalidate_snapshot()
+        return lines
+
+    def write(self, vals):
+        if not {"template_id", *SNAPSHOT_LINE_FIELDS}.intersection(vals):
+            return super().write(vals)
+        templates = self.template_id
+        res = super().write(vals)
+        (templates | self.template_id)._invalidate_snapshot()
+        return res
+
+    def unlink(self):
+        templates = self.template_id
+        res = super().unlink()
+        templates = templates.exists()
+        templates._invalidate_snapshot()
+        templates._check_formula_dependencies()
+        return res
+
     @api.constrains("type", "python_code")
     def _check_python_code(self):
         for line in self:
-            if line.type == "computed" and not line.python_code:
+            if line.type != "computed":
+                continue
+            if not line.python_code:
                 raise ValidationError(
                     _("Python Code must be set for computed line with sequence %d.")
                     % line.sequence
                 )
+            try:
+                compile_formula(line.python_code)
+            except SyntaxError as err:
+                raise ValidationError(
+                    _(
+                        "The syntax of the formula of line with sequence %d is wrong."
+                    )
+                    % line.sequence
+                ) from err
+            except ValueError as err:
+                raise ValidationError(
+                    _("Invalid formula on line with sequence %(sequence)d: %(error)s")
+                    % {"sequence": line.sequence, "error": err}
+                ) from err
+
+    @api.constrains("template_id", "sequence", "type", "python_code")
+    def _check_formula_dependencies(self):
+        self.template_id._check_formula_dependencies()
+
+    @api.depends("account_code", "template_id.company_id")
+    def _compute_resolved_account_id(self):
+        Template = self.env["account.move.template"]
+        for company, lines in self.grouped(
+            lambda line: line.template_id.company_id
+        ).items():
+            if not company:
+                lines.resolved_account_id = False
+                continue
+            account_map = Template._resolve_account_codes(
+                lines.mapped("account_code"), company
+            )
+            for line in lines:
+                line.resolved_account_id = account_map.get(line.account_code, False)
+
+    @api.model
+    def _recompute_resolved_account(self, codes, companies):
+        """Recompute the resolved account of the lines matching one of the
+        account ``codes``, of the templates of ``companies`` and of their
+        branches, after these accounts changed.
+
+        The account lookup cache is only cleared when a line matches one of
+        the codes.
+        """
+        lines = self.sudo()._search_by_account_codes(codes)
+        if not lines:
+            return
+        self.env.registry.clear_cache()
+        lines = lines.with_context(active_test=False).search(
+            [
+                ("id", "in", lines.ids),
+                ("template_id.company_id", "child_of", companies.ids),
+            ]
+        )
+        self.env.add_to_compute(self._fields["resolved_account_id"], lines)
+        lines.template_id._invalidate_snapshot()
+
+    @api.model
+    def _search_by_account_codes(self, codes):
+        """Return the lines whose account prefix matches one of ``codes``"""
+        codes = [code for code in codes if code]
+        if not codes:
+            return self.browse()
+        self.flush_model(["account_code"])
+        self.env.cr.execute(
+            """
+            SELECT line.id FROM account_move_template_line AS line
+            WHERE EXISTS (
+                SELECT 1 FROM unnest(%s) AS code
+                WHERE starts_with(code, line.account_code)
+            )
+            """,
+            [codes],
+        )
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
 
     @api.depends("product_id")
     def _compute_product_uom_id(self):
@@ -0,0 +1,120 @@
+import logging
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.translate import _
+
+from .account_move_template_stat import track_phase
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountMoveTemplate(models.Model):
+    _inherit = "account.move.template"
+
+    post_in_background = fields.Boolean(
+        help="If checked, the generated entries are created in draft and posted "
+        "in batches by a background job, instead of being left in draft for "
+        "journal entries or posted right away for payments",
+    )
+
+    def _trigger_post_queued(self, records):
+        """Trigger the posting of ``records`` if they are queued for it"""
+        if self.post_in_background and records:
+            self.env.ref("account_move_template.ir_cron_post_queued_entries")._trigger()
+
+    @api.model
+    def _post_queued_entries(self, model_name, batch_size, deadline):
+        """Post the queued moves or payments, journal by journal, by batches
+        of ``batch_size``, each batch being committed.
+
+        :return: True if all the queued entries are posted, False if the
+            deadline was reached before
+        """
+        Model = self.env[model_name]
+        while records := Model.search(
+            [("template_post_queued", "=", True)],
+            order="journal_id, id",
+            limit=batch_size,
+        ):
+            for batch in records.grouped("journal_id").values():
+                self._post_queued_batch(batch)
+            if not self._commit_progress(deadline):
+                return False
+        return True
+
+    @api.model
+    def _post_queued_batch(self, records):
+        """Post ``records`` with a single ``action_post``, or one by one if
+        that fails, the entries failing being left in draft with the error
+        logged in their chatter"""
+        drafts = records.filtered(lambda record: record.state == "draft")
+        try:
+            with self.env.cr.savepoint():
+                if drafts._name == "account.move":
+                    with track_phase("names"):
+                        self._preallocate_move_names(drafts)
+                with track_phase("post"):
+                    drafts.action_post()
+        except (UserError, ValidationError):
+            for record in drafts:
+                try:
+                    with self.env.cr.savepoint():
+                        record.action_post()
+                except (UserError, ValidationError) as err:
+                    _logger.warning(
+                        "Queued %s %s could not be posted: %s",
+                        record._name,
+                        record.id,
+                        err,
+                    )
+                    record.message_post(
+                        body=_("Posting in background failed: %s") % err
+                    )
+        records.template_post_queued = False
+
+    @api.model
+    def _preallocate_move_names(self, moves):
+        """Give consecutive names to the draft ``moves`` before posting them.
+
+        The last name of the sequence of each journal, move type and period
+        is looked for, and locked, once: the names of the other moves of the
+        period are the following ones, assigned in memory, instead of each
+        move locking the last name of its journal. The names are assigned in
+        the transaction posting the moves, so that numbering stays gap-free.
+        """
+        moves = moves.filtered(lambda move: not move.name or move.name == "/")
+        for group in moves.grouped(
+            lambda move: (move.journal_id, move.move_type)
+        ).values():
+            period = None
+            for move in group.sorted(lambda move: (move.date, move.ref or "", move.id)):
+                if period and period[0] <= move.date <= period[1]:
+                    format_values["seq"] += 1
+                    move.name = format_string.format(**format_values)
+                    continue
+                move._set_next_sequence()
+                format_string, format_values = move._get_sequence_format_param(
+                    move.name
+                )
+                period = move._get_sequence_date_range(
+                    move._deduce_sequence_number_reset(move.name)
+                )
+
+    @api.model
+    def _cron_post_queued_entries(self):
+        """Post the entries generated in draft by templates posting in
+        background, within the time limit of ``_run_until_deadline``"""
+        batch_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.post_batch_size", 1000)
+        )
+        self._run_until_deadline(
+            "account_move_template.ir_cron_post_queued_entries",
+            "account_move_template.post_time_limit",
+            lambda deadline: all(
+                self._post_queued_entries(model_name, batch_size, deadline)
+                for model_name in ("account.move", "account.payment")
+            ),
+        )
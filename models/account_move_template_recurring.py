@@ -0,0 +1,181 @@
+import functools
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# relativedelta argument of each recurrence rule type
+RECURRING_UNITS = {
+    "daily": "days",
+    "weekly": "weeks",
+    "monthly": "months",
+    "yearly": "years",
+}
+
+
+class AccountMoveTemplate(models.Model):
+    _inherit = "account.move.template"
+
+    recurring = fields.Boolean(
+        help="If checked, entries are generated automatically from this template "
+        "at each occurrence of the recurrence",
+    )
+    recurring_interval = fields.Integer(
+        string="Repeat Every",
+        default=1,
+    )
+    recurring_rule_type = fields.Selection(
+        selection=[
+            ("daily", "Days"),
+            ("weekly", "Weeks"),
+            ("monthly", "Months"),
+            ("yearly", "Years"),
+        ],
+        string="Recurrence",
+        default="monthly",
+    )
+    recurring_next_date = fields.Date(
+        string="Next Date",
+        copy=False,
+        help="Date of the next entries to generate",
+    )
+    recurring_end_date = fields.Date(
+        string="End Date",
+        help="No entries are generated after this date",
+    )
+    recurring_partner_ids = fields.Many2many(
+        comodel_name="res.partner",
+        string="Recurring Partners",
+        help="One entry is generated for each of these partners at each "
+        "occurrence, or a single one for the partner of the template if empty",
+    )
+    recurring_amount = fields.Float(
+        string="Recurring Amount",
+        digits="Product Price",
+        help="Amount of the generated entries, see the Amount of the wizard",
+    )
+    recurring_overwrite = fields.Text(
+        help="Overwrite dictionary of the generated entries, see the Overwrite "
+        "of the wizard",
+    )
+    recurring_progress = fields.Integer(
+        readonly=True,
+        copy=False,
+        help="Number of entries already generated for the next date, used to "
+        "resume the generation where it stopped",
+    )
+
+    def _get_recurring_params_list(self):
+        """Return the run parameters of one occurrence of the recurrence"""
+        self.ensure_one()
+        partners = self.recurring_partner_ids.sorted("id") or self.partner_id
+        return [
+            {
+                "date": self.recurring_next_date,
+                "partner_id": partner.id,
+                "ref": self.ref,
+                "amount": self.recurring_amount,
+                "overwrite": self.recurring_overwrite,
+            }
+            for partner in partners or [partners]
+        ]
+
+    def _get_recurring_next_date(self):
+        self.ensure_one()
+        unit = RECURRING_UNITS[self.recurring_rule_type or "monthly"]
+        return self.recurring_next_date + relativedelta(
+            **{unit: max(self.recurring_interval, 1)}
+        )
+
+    def _is_recurring_due(self, date):
+        self.ensure_one()
+        return (
+            self.recurring
+            and self.recurring_next_date
+            and self.recurring_next_date <= date
+            and (
+                not self.recurring_end_date
+                or self.recurring_next_date <= self.recurring_end_date
+            )
+        )
+
+    def _generate_recurring_entries(self, batch_size, deadline):
+        """Generate the entries of all the due occurrences of the template.
+
+        Entries are generated by chunks of ``batch_size`` runs, each chunk being
+        committed with the progress of the occurrence, so that a generation
+        interrupted by a crash or by ``deadline`` resumes after the last
+        committed chunk.
+
+        :return: True if the template is up to date, False if the deadline
+            was reached before
+        """
+        self.ensure_one()
+        today = fields.Date.context_today(self)
+        while self._is_recurring_due(today):
+            params_list = self._get_recurring_params_list()
+            while self.recurring_progress < len(params_list):
+                start = self.recurring_progress
+                with self.env.cr.savepoint():
+                    self._generate_entries(params_list[start : start + batch_size])
+                    self.recurring_progress = min(
+                        start + batch_size, len(params_list)
+                    )
+                if not self._commit_progress(deadline):
+                    return False
+            self.write(
+                {
+                    "recurring_next_date": self._get_recurring_next_date(),
+                    "recurring_progress": 0,
+                }
+            )
+            self._commit_progress()
+        return True
+
+    @api.model
+    def _cron_generate_recurring_entries(self):
+        """Generate the entries of all the due recurring templates, within the
+        time limit of ``_run_until_deadline``"""
+        batch_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.recurring_batch_size", 500)
+        )
+        self._run_until_deadline(
+            "account_move_template.ir_cron_generate_recurring_entries",
+            "account_move_template.recurring_time_limit",
+            functools.partial(self._generate_due_recurring_entries, batch_size),
+        )
+
+    @api.model
+    def _generate_due_recurring_entries(self, batch_size, deadline):
+        """Generate the entries of the due recurring templates, a template
+        failing being logged and skipped with its progress kept.
+
+        :return: True if all the templates are up to date, False if the
+            deadline was reached before
+        """
+        templates = self.search(
+            [
+                ("recurring", "=", True),
+                ("recurring_next_date", "<=", fields.Date.context_today(self)),
+            ]
+        )
+        for template in templates:
+            if template.company_id:
+                template = template.with_company(template.company_id)
+            try:
+                done = template._generate_recurring_entries(batch_size, deadline)
+            except Exception:
+                # the failing chunk was rolled back, the other templates still
+                # have to be generated
+                _logger.exception(
+                    "Recurring generation of template %s failed", template.id
+                )
+                continue
+            if not done:
+                return False
+        return True
@@ -0,0 +1,158 @@
+from collections import Counter, defaultdict
+
+from odoo import Command, api, models
+from odoo.exceptions import UserError
+from odoo.tools.translate import _
+
+
+class AccountMoveTemplate(models.Model):
+    _inherit = "account.move.template"
+
+    def replicate_to_companies(
+        self, companies, journal_code_map=None, account_code_map=None
+    ):
+        """Copy the templates and their lines into each of ``companies``.
+
+        The copies of the templates, then all their lines, are created with
+        one batched ``create`` each. Journal codes and account prefixes are
+        remapped through the given mappings, the ones missing from them being
+        kept. Partners, payment terms and products the target company cannot
+        use are left empty, and the analytic distributions lose the analytic
+        accounts it cannot use. The names and translations of the templates are
+        kept, the unique constraints being checked on all the copies before
+        creating any of them.
+
+        :param companies: ``res.company`` recordset
+        :param journal_code_map: dict mapping journal codes to the codes of
+            the copies
+        :param account_code_map: dict mapping account prefixes to the
+            prefixes of the copies
+        :return: the created templates
+        """
+        journal_code_map = journal_code_map or {}
+        account_code_map = account_code_map or {}
+        self._check_replication(companies)
+        analytic_accounts = (
+            self.env["account.analytic.account"]
+            .browse(
+                {
+                    int(analytic_id)
+                    for distribution in self.line_ids.mapped("analytic_distribution")
+                    for key in distribution or {}
+                    for analytic_id in key.split(",")
+                }
+            )
+            .exists()
+        )
+        analytic_ids = {
+            company: set(self._filter_company(analytic_accounts, company).ids)
+            for company in companies
+        }
+        lines_by_template = defaultdict(list)
+        for line, vals in zip(self.line_ids, self.line_ids.copy_data()):
+            lines_by_template[line.template_id].append((line, vals))
+        templates_vals = list(zip(self, self.copy_data()))
+        vals_list = []
+        sources = []
+        for company in companies:
+            for template, vals in templates_vals:
+                partners = self._filter_company(template.recurring_partner_ids, company)
+                vals_list.append(
+                    {
+                        **vals,
+                        "company_id": company.id,
+                        "journal_code": journal_code_map.get(
+                            template.journal_code, template.journal_code
+                        ),
+                        "partner_id": self._filter_company(
+                            template.partner_id, company
+                        ).id,
+                        "invoice_payment_term_id": self._filter_company(
+                            template.invoice_payment_term_id, company
+                        ).id,
+                        "recurring_partner_ids": [Command.set(partners.ids)],
+                    }
+                )
+                sources.append(template)
+        copies = self.create(vals_list)
+        lines_vals_list = []
+        for copied, template in zip(copies, sources):
+            company = copied.company_id
+            for line, vals in lines_by_template[template]:
+                lines_vals_list.append(
+                    {
+                        **vals,
+                        "template_id": copied.id,
+                        "account_code": account_code_map.get(
+                            line.account_code, line.account_code
+                        ),
+                        "partner_id": self._filter_company(
+                            line.partner_id, company
+                        ).id,
+                        "product_id": self._filter_company(
+                            line.product_id, company
+                        ).id,
+                        "analytic_distribution": self._filter_analytic_distribution(
+                            line.analytic_distribution, analytic_ids[company]
+                        ),
+                    }
+                )
+        self.env["account.move.template.line"].create(lines_vals_list)
+        # the copies got the names in the current language only
+        self.env.cr.execute(
+            """
+            UPDATE account_move_template AS target SET name = source.name
+            FROM account_move_template AS source,
+                unnest(%s, %s) AS replica(target_id, source_id)
+            WHERE target.id = replica.target_id AND source.id = replica.source_id
+            """,
+            [copies.ids, [template.id for template in sources]],
+        )
+        copies.invalidate_recordset(["name"])
+        return copies
+
+    def _check_replication(self, companies):
+        """Check that the copies of the templates in ``companies`` satisfy the
+        unique constraint of the names of the templates
+
+        :raise UserError: if a copy would have the name of another template of
+            its company
+        """
+        names = [template.name for template in self]
+        existing = self.with_context(active_test=False).search_read(
+            [("company_id", "in", companies.ids), ("name", "in", names)],
+            ["name", "company_id"],
+            load=None,
+        )
+        used_names = {(vals["name"], vals["company_id"]) for vals in existing}
+        name_counts = Counter(names)
+        conflicts = [
+            "%s (%s)" % (name, company.name)
+            for company in companies
+            for name in sorted(set(names))
+            if name_counts[name] > 1 or (name, company.id) in used_names
+        ]
+        if conflicts:
+            raise UserError(
+                _(
+                    "The templates cannot be replicated, their names would be "
+                    "used twice in a company: %s"
+                )
+                % ", ".join(conflicts)
+            )
+
+    @api.model
+    def _filter_company(self, records, company):
+        """Return the records of ``records`` that ``company`` can use"""
+        return records.filtered_domain(records._check_company_domain(company))
+
+    @api.model
+    def _filter_analytic_distribution(self, distribution, analytic_ids):
+        """Return ``distribution`` without the entries using analytic accounts
+        outside of ``analytic_ids``"""
+        distribution = {
+            key: percentage
+            for key, percentage in (distribution or {}).items()
+            if {int(analytic_id) for analytic_id in key.split(",")} <= analytic_ids
+        }
+        return distribution or False
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+_tracking = threading.local()
+
+
+class RunTracker:
+    """Time and query count of the phases of a template run"""
+
+    __slots__ = ("cr", "phases")
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.phases = defaultdict(lambda: {"seconds": 0.0, "queries": 0})
+
+    @contextmanager
+    def phase(self, name):
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase = self.phases[name]
+            phase["seconds"] += time.perf_counter() - start
+            phase["queries"] += self.cr.sql_log_count - queries
+
+
+def get_tracker():
+    """Return the tracker of the template run being measured, if any"""
+    return getattr(_tracking, "tracker", None)
+
+
+def set_tracker(tracker):
+    _tracking.tracker = tracker
+
+
+@contextmanager
+def track_phase(name):
+    """Measure a phase of the template run being tracked, if any.
+
+    Phases may be nested, the time and queries of a phase then also count in
+    the enclosing ones.
+    """
+    tracker = get_tracker()
+    if tracker is None:
+        yield
+        return
+    with tracker.phase(name):
+        yield
+
+
+class AccountMoveTemplateStat(models.Model):
+    _name = "account.move.template.stat"
+    _description = "Journal Entry Template Run Statistics"
+    _order = "id desc"
+
+    template_id = fields.Many2one(
+        comodel_name="account.move.template",
+        string="Move Template",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    operation = fields.Char(required=True)
+    size = fields.Integer(help="Number of lines or runs processed")
+    duration = fields.Float(string="Duration (s)", digits=(16, 3))
+    query_count = fields.Integer(string="Queries")
+    phases = fields.Json(help="Duration and queries of each phase of the run")
+
+    @api.autovacuum
+    def _gc_stats(self):
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.stats_retention_days", 30)
+        )
+        limit_date = fields.Datetime.now() - relativedelta(days=days)
+        self.search([("create_date", "<", limit_date)]).unlink()
+
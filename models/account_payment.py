@@ -0,0 +1,12 @@
+from odoo import fields, models
+
+
+class AccountPayment(models.Model):
+    _inherit = "account.payment"
+
+    template_post_queued = fields.Boolean(
+        copy=False,
+        index=True,
+        help="Generated from a template in draft, waiting to be posted in "
+        "background",
+    )
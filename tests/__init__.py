@@ -2,3 +2,11 @@
 # doesn't exist any more on v12
 # from . import test_account_move_template
 from . import test_account_move_template_options
+from . import test_account_move_template_run
+from . import test_account_move_template_recurring
+from . import test_account_move_template_job
+from . import test_account_move_template_import
+from . import test_account_move_template_post
+from . import test_account_move_template_replicate
+from . import test_account_move_template_search
+from . import test_account_move_template_benchmark
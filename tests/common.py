@@ -0,0 +1,48 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from odoo import Command
+from odoo.tests.common import TransactionCase
+
+
+class AccountMoveTemplateCommon(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.env.company
+        cls.Account = cls.env["account.account"]
+        cls.Template = cls.env["account.move.template"]
+        cls.TemplateRun = cls.env["account.move.template.run"]
+
+        cls.journal = cls.env["account.journal"].create(
+            {"name": "Template Journal", "code": "TMPLJ", "type": "general"}
+        )
+        cls.accounts = cls.Account.create(
+            [
+                {
+                    "name": "Template Account %d" % index,
+                    "code": "TMPL%03d" % index,
+                    "account_type": "expense",
+                }
+                for index in range(30)
+            ]
+        )
+        cls.partner = cls.env["res.partner"].create({"name": "Template partner"})
+
+    @classmethod
+    def _create_template(cls, name, nb_lines, prefix="TMPL"):
+        return cls.Template.create(
+            {
+                "name": name,
+                "journal_code": cls.journal.code,
+                "line_ids": [
+                    Command.create(
+                        {
+                            "sequence": index,
+                            "name": "Line %d" % index,
+                            "account_code": "%s%03d" % (prefix, index),
+                            "type": "input",
+                        }
+                    )
+                    for index in range(nb_lines)
+                ],
+            }
+        )
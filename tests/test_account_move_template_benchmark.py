@@ -0,0 +1,176 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+import json
+import logging
+import time
+
+from odoo import Command
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.account_move_template.models.account_move_template import (
+    _move_vals_cache,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class TestAccountMoveTemplateBenchmark(TransactionCase):
+    """Query counts and timings of template generation on synthetic templates.
+
+    For each phase, the number of queries measured on the smallest size is
+    the base of the ``assertQueryCount`` of the bigger sizes: they must not
+    grow more than linearly with the number of lines or runs. Measures are
+    logged as JSON records for tracking timings.
+    """
+
+    LINE_SIZES = (10, 100)
+    RUN_SIZES = (1, 100)
+    PAYMENT_SIZES = (1, 10)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Template = cls.env["account.move.template"]
+        cls.TemplateRun = cls.env["account.move.template.run"]
+        cls.journal = cls.env["account.journal"].create(
+            {"name": "Benchmark Journal", "code": "BNCHJ", "type": "general"}
+        )
+        cls.bank_journal = cls.env["account.journal"].create(
+            {"name": "Benchmark Bank", "code": "BNCHB", "type": "bank"}
+        )
+        cls.account = cls.env["account.account"].create(
+            {"name": "Benchmark", "code": "BNCH00", "account_type": "expense"}
+        )
+        cls.partner = cls.env["res.partner"].create({"name": "Benchmark partner"})
+
+    def _create_template(self, nb_lines):
+        return self.Template.create(
+            {
+                "name": "Benchmark Template %d" % nb_lines,
+                "journal_code": self.journal.code,
+                "line_ids": [
+                    Command.create(
+                        {
+                            "sequence": index,
+                            "name": "Line %d" % index,
+                            "account_code": self.account.code,
+                            "balance": 1.0 if index % 2 else -1.0,
+                        }
+                    )
+                    for index in range(nb_lines)
+                ],
+            }
+        )
+
+    def _measure(self, phase, size, run):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        run()
+        self.env.flush_all()
+        duration = time.perf_counter() - start
+        queries = self.cr.sql_log_count - queries
+        _logger.info(
+            "account_move_template benchmark: %s",
+            json.dumps(
+                {
+                    "phase": phase,
+                    "size": size,
+                    "queries": queries,
+                    "seconds": round(duration, 3),
+                }
+            ),
+        )
+        return queries
+
+    def _benchmark(self, phase, sizes, prepare):
+        """Measure ``prepare(size)()`` for each of the increasing ``sizes``"""
+        base_size, *other_sizes = sizes
+        base_queries = self._measure(phase, base_size, prepare(base_size))
+        for size in other_sizes:
+            run = prepare(size)
+            with self.assertQueryCount(base_queries * size // base_size):
+                self._measure(phase, size, run)
+
+    def test_load_lines(self):
+        def prepare(nb_lines):
+            template = self._create_template(nb_lines)
+            return self.TemplateRun.create({"template_id": template.id}).load_lines
+
+        self._benchmark("load_lines", self.LINE_SIZES, prepare)
+
+    def test_create_move(self):
+        def prepare(nb_lines):
+            template = self._create_template(nb_lines)
+            wizard = self.TemplateRun.create({"template_id": template.id})
+            wizard.load_lines()
+            return wizard.create_move
+
+        self._benchmark("create_move", self.LINE_SIZES, prepare)
+
+    def test_generate_moves(self):
+        template = self._create_template(self.LINE_SIZES[0])
+
+        def prepare(nb_runs):
+            # distinct runs, measured on an empty cache of move values
+            _move_vals_cache.clear()
+            params_list = [
+                {"overwrite": {"L0": {"amount": -amount}, "L1": {"amount": amount}}}
+                for amount in range(1, nb_runs + 1)
+            ]
+            return lambda: template.generate_moves(params_list)
+
+        self._benchmark("generate_moves", self.RUN_SIZES, prepare)
+
+    def test_create_payment(self):
+        template = self.Template.create(
+            {
+                "name": "Benchmark Payment Template",
+                "journal_code": self.bank_journal.code,
+                "is_payment": True,
+                "payment_type": "inbound",
+                "partner_type": "customer",
+            }
+        )
+
+        def prepare(nb_runs):
+            wizards = self.TemplateRun.create(
+                [
+                    {
+                        "template_id": template.id,
+                        "partner_id": self.partner.id,
+                        "amount": 100.0,
+                    }
+                ]
+                * nb_runs
+            )
+            return lambda: [wizard.create_payment() for wizard in wizards]
+
+        self._benchmark("create_payment", self.PAYMENT_SIZES, prepare)
+
+    def test_generate_payments(self):
+        template = self.Template.create(
+            {
+                "name": "Benchmark Batch Payment Template",
+                "journal_code": self.bank_journal.code,
+                "is_payment": True,
+                "payment_type": "inbound",
+                "partner_type": "customer",
+            }
+        )
+
+        def prepare(nb_runs):
+            params = {"partner_id": self.partner.id, "amount": 100.0}
+            return lambda: template.generate_payments([params] * nb_runs)
+
+        self._benchmark("generate_payments", self.RUN_SIZES, prepare)
+
+
+@tagged("-standard", "account_move_template_benchmark")
+class TestAccountMoveTemplateBenchmarkFull(TestAccountMoveTemplateBenchmark):
+    """Same benchmarks on full size templates and batches, run on demand with
+    ``--test-tags account_move_template_benchmark``"""
+
+    LINE_SIZES = (10, 100, 1000)
+    RUN_SIZES = (1, 100, 1000)
+    PAYMENT_SIZES = (1, 100, 1000)
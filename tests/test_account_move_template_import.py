@@ -0,0 +1,46 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+import base64
+
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplateImport(AccountMoveTemplateCommon):
+    def test_import_file(self):
+        template = self._create_template("Imported Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        self.partner.ref = "TMPLP"
+        content = "\n".join(
+            [
+                "partner_ref,date,ref,L0.amount,L1.amount",
+                "TMPLP,2026-01-31,Import 1,20,-20",
+                "NOPE,2026-01-31,Import 2,20,-20",
+                "TMPLP,2026-01-31,Import 3,30,-20",
+                "TMPLP,not a date,Import 4,,",
+                "TMPLP,,Import 5,,",
+            ]
+        )
+        file_import = self.env["account.move.template.import"].create(
+            {
+                "template_id": template.id,
+                "file": base64.b64encode(content.encode()),
+                "filename": "runs.csv",
+            }
+        )
+        file_import.action_start()
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.import_chunk_size", 2
+        )
+        self.env["account.move.template.import"]._cron_run_imports()
+        self.assertEqual(file_import.state, "done")
+        self.assertEqual(file_import.row_count, 5)
+        self.assertEqual(file_import.generated_count, 2)
+        self.assertEqual(file_import.error_count, 3)
+        self.assertEqual(file_import.error_ids.mapped("row_number"), [3, 4, 5])
+        moves = self.env["account.move"].search([("ref", "like", "Import")])
+        self.assertEqual(sorted(moves.mapped("ref")), ["Import 1", "Import 5"])
+        report = base64.b64decode(file_import.error_file).decode().splitlines()
+        self.assertEqual(len(report), 4)
+        self.assertTrue(report[0].endswith(",error"))
+        self.assertTrue(report[1].startswith("NOPE,"))
+        self.assertEqual(file_import.error_filename, "runs_errors.csv")
@@ -0,0 +1,73 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from unittest.mock import patch
+
+from odoo import fields
+
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplateJob(AccountMoveTemplateCommon):
+    def test_dispatch_generation(self):
+        template = self._create_template("Dispatched Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        params_list = [
+            {"ref": "Chunk run %d" % index, "date": fields.Date.today()}
+            for index in range(5)
+        ]
+        params_list[3]["overwrite"] = "{'L1': {'account_id': 1}}"
+        jobs = template.dispatch_generation(params_list, chunk_size=2)
+        self.assertEqual(jobs.mapped("size"), [2, 2, 1])
+        self.assertEqual(template.generation_job_ids, jobs)
+        self.env["account.move.template.job"]._cron_run_generation_jobs()
+        self.assertEqual(jobs.mapped("state"), ["done", "failed", "done"])
+        self.assertEqual(jobs.mapped("result_count"), [2, 0, 1])
+        self.assertIn("Valid fields to overwrite", jobs[1].error)
+        moves = self.env["account.move"].search([("ref", "like", "Chunk run")])
+        self.assertEqual(len(moves), 3)
+        jobs[1].params = [params_list[2]]
+        jobs[1].action_retry()
+        self.env["account.move.template.job"]._cron_run_generation_jobs()
+        self.assertEqual(jobs[1].state, "done")
+
+    def test_dispatch_generation_time_limit(self):
+        template = self._create_template("Time Limited Template", 1)
+        jobs = template.dispatch_generation([{}, {}, {}], chunk_size=1)
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.job_time_limit", -1
+        )
+        Job = self.env["account.move.template.job"]
+        with patch.object(type(self.env["ir.cron"]), "_trigger") as trigger:
+            Job._cron_run_generation_jobs()
+        self.assertEqual(jobs.mapped("state"), ["done", "pending", "pending"])
+        trigger.assert_called_once()
+
+    def test_dispatch_generation_threads(self):
+        template = self._create_template("Threaded Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        jobs = template.dispatch_generation(
+            [{"ref": "Threaded run %d" % index} for index in range(3)], chunk_size=1
+        )
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.job_workers", 2
+        )
+        self.env.flush_all()
+        # the cursors of the threads share the transaction of the test
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        self.env["account.move.template.job"]._cron_run_generation_jobs()
+        self.env.invalidate_all()
+        self.assertEqual(jobs.mapped("state"), ["done"] * 3)
+        moves = self.env["account.move"].search([("ref", "like", "Threaded run")])
+        self.assertEqual(len(moves), 3)
+
+    def test_dispatch_generation_cron_copies(self):
+        cron = self.env.ref("account_move_template.ir_cron_run_generation_jobs")
+        crons = cron | cron.copy()
+        template = self._create_template("Copied Cron Template", 1)
+        with patch.object(type(cron), "_trigger", autospec=True) as trigger:
+            template.dispatch_generation([{}])
+        self.assertEqual(
+            sorted(call.args[0].id for call in trigger.call_args_list), crons.ids
+        )
@@ -0,0 +1,46 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from unittest.mock import patch
+
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplatePost(AccountMoveTemplateCommon):
+    def test_post_in_background(self):
+        template = self._create_template("Background Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        template.post_in_background = True
+        moves = template.generate_moves([{"ref": "Queued 1"}, {"ref": "Queued 2"}])
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        moves |= wizard.create_move()
+        self.assertEqual(moves.mapped("state"), ["draft"] * 3)
+        self.assertTrue(all(moves.mapped("template_post_queued")))
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.post_batch_size", 2
+        )
+        self.Template._cron_post_queued_entries()
+        self.assertEqual(moves.mapped("state"), ["posted"] * 3)
+        self.assertFalse(any(moves.mapped("template_post_queued")))
+
+    def test_post_in_background_names(self):
+        template = self._create_template("Numbered Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        template.post_in_background = True
+        moves = template.generate_moves(
+            [{"ref": "Numbered %d" % index, "date": "2026-03-31"} for index in range(4)]
+        )
+        Move = type(self.env["account.move"])
+        with patch.object(
+            Move,
+            "_set_next_sequence",
+            autospec=True,
+            side_effect=Move._set_next_sequence,
+        ) as next_sequence:
+            self.Template._cron_post_queued_entries()
+        self.assertEqual(next_sequence.call_count, 1)
+        self.assertEqual(moves.mapped("state"), ["posted"] * 4)
+        numbers = moves.sorted("sequence_number").mapped("sequence_number")
+        self.assertEqual(numbers, list(range(numbers[0], numbers[0] + 4)))
+        self.assertEqual(len(set(moves.mapped("name"))), 4)
@@ -0,0 +1,84 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from dateutil.relativedelta import relativedelta
+
+from odoo import Command, fields
+
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplateRecurring(AccountMoveTemplateCommon):
+    def test_recurring_generation(self):
+        template = self._create_template("Recurring Template", 2)
+        template.line_ids[0].balance = 50.0
+        template.line_ids[1].balance = -50.0
+        partners = self.env["res.partner"].create(
+            [{"name": "Recurring partner %d" % index} for index in range(3)]
+        )
+        today = fields.Date.context_today(template)
+        template.write(
+            {
+                "recurring": True,
+                "recurring_rule_type": "monthly",
+                "recurring_next_date": today - relativedelta(months=1),
+                "recurring_partner_ids": [Command.set(partners.ids)],
+            }
+        )
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.recurring_batch_size", 2
+        )
+        self.Template._cron_generate_recurring_entries()
+        moves = self.env["account.move"].search([("journal_id", "=", self.journal.id)])
+        self.assertEqual(len(moves), 6)
+        self.assertEqual(moves.partner_id, partners)
+        self.assertEqual(
+            set(moves.mapped("date")), {today - relativedelta(months=1), today}
+        )
+        self.assertEqual(template.recurring_next_date, today + relativedelta(months=1))
+        self.assertFalse(template.recurring_progress)
+
+    def test_recurring_resume(self):
+        template = self._create_template("Resumed Template", 1)
+        partners = self.env["res.partner"].create(
+            [{"name": "Resumed partner %d" % index} for index in range(3)]
+        )
+        today = fields.Date.context_today(template)
+        template.write(
+            {
+                "recurring": True,
+                "recurring_next_date": today,
+                "recurring_end_date": today,
+                "recurring_partner_ids": [Command.set(partners.ids)],
+                "recurring_progress": 2,
+            }
+        )
+        template._generate_recurring_entries(10, float("inf"))
+        moves = self.env["account.move"].search([("journal_id", "=", self.journal.id)])
+        self.assertEqual(moves.partner_id, partners.sorted("id")[2])
+        self.assertFalse(template._is_recurring_due(today + relativedelta(years=1)))
+
+    def test_recurring_failure(self):
+        broken = self._create_template("Broken Recurring", 1)
+        template = self._create_template("Recurring After Broken", 2)
+        template.line_ids[0].balance = 50.0
+        template.line_ids[1].balance = -50.0
+        today = fields.Date.context_today(template)
+        (broken | template).write(
+            {
+                "recurring": True,
+                "recurring_next_date": today,
+                "recurring_end_date": today,
+                "partner_id": self.partner.id,
+            }
+        )
+        broken.recurring_overwrite = "not a dict"
+        with self.assertLogs(
+            "odoo.addons.account_move_template.models.account_move_template_recurring",
+            "ERROR",
+        ) as logs:
+            self.Template._cron_generate_recurring_entries()
+        self.assertIn("template %s failed" % broken.id, logs.output[0])
+        self.assertEqual(broken.recurring_next_date, today)
+        self.assertFalse(template._is_recurring_due(today))
+        moves = self.env["account.move"].search([("journal_id", "=", self.journal.id)])
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(moves.line_ids.mapped("balance"), [50.0, -50.0])
@@ -0,0 +1,85 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from odoo import Command
+from odoo.exceptions import UserError
+
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplateReplicate(AccountMoveTemplateCommon):
+    def test_replicate_to_companies(self):
+        templates = self._create_template("Replicated 1", 2) | self._create_template(
+            "Replicated 2", 1
+        )
+        templates.company_id = self.company
+        company_partner = self.env["res.partner"].create(
+            {"name": "Company partner", "company_id": self.company.id}
+        )
+        templates[0].partner_id = company_partner
+        plan = self.env["account.analytic.plan"].create({"name": "Replica Plan"})
+        company_analytic, shared_analytic = self.env["account.analytic.account"].create(
+            [
+                {"name": "Company", "plan_id": plan.id, "company_id": self.company.id},
+                {"name": "Shared", "plan_id": plan.id, "company_id": False},
+            ]
+        )
+        templates[0].line_ids[0].analytic_distribution = {
+            str(company_analytic.id): 100
+        }
+        templates[0].line_ids[1].analytic_distribution = {
+            str(shared_analytic.id): 100
+        }
+        other_company = self.env["res.company"].create({"name": "Replica Company"})
+        other_journal = self.env["account.journal"].create(
+            {
+                "name": "Replica Journal",
+                "code": "REPJ",
+                "type": "general",
+                "company_id": other_company.id,
+            }
+        )
+        other_accounts = self.Account.with_company(other_company).create(
+            [
+                {
+                    "name": "Replica Account %d" % index,
+                    "code": "REP%03d" % index,
+                    "account_type": "expense",
+                    "company_ids": [Command.set(other_company.ids)],
+                }
+                for index in range(2)
+            ]
+        )
+        copies = templates.replicate_to_companies(
+            other_company,
+            journal_code_map={"TMPLJ": "REPJ"},
+            account_code_map={"TMPL000": "REP000", "TMPL001": "REP001"},
+        )
+        self.assertRecordValues(
+            copies,
+            [
+                {
+                    "name": "Replicated 1",
+                    "company_id": other_company.id,
+                    "journal_code": "REPJ",
+                    "resolved_journal_id": other_journal.id,
+                    "partner_id": False,
+                },
+                {
+                    "name": "Replicated 2",
+                    "company_id": other_company.id,
+                    "journal_code": "REPJ",
+                    "resolved_journal_id": other_journal.id,
+                    "partner_id": False,
+                },
+            ],
+        )
+        self.assertEqual(
+            copies[0].line_ids.mapped("account_code"), ["REP000", "REP001"]
+        )
+        self.assertEqual(copies[0].line_ids.resolved_account_id, other_accounts)
+        self.assertEqual(
+            copies[0].line_ids.mapped("analytic_distribution"),
+            [False, {str(shared_analytic.id): 100}],
+        )
+        self.assertEqual(copies[1].line_ids.mapped("sequence"), [0])
+        with self.assertRaisesRegex(UserError, r"Replicated 1 \(Replica Company\)"):
+            templates.replicate_to_companies(other_company)
@@ -0,0 +1,594 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+import random
+from unittest.mock import patch
+
+from odoo import Command, fields
+from odoo.exceptions import UserError, ValidationError
+
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplateRun(AccountMoveTemplateCommon):
+    def _count_load_lines_queries(self, template):
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        self.env.flush_all()
+        self.env.invalidate_all()
+        count = self.cr.sql_log_count
+        wizard.load_lines()
+        self.env.flush_all()
+        return self.cr.sql_log_count - count
+
+    def test_load_lines_resolve_account_prefix(self):
+        template = self._create_template("Prefix Template", 3)
+        template.line_ids[2].account_code = "TMPL02"
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        self.assertEqual(
+            wizard.line_ids.mapped("account_id"),
+            self.accounts[0] | self.accounts[1] | self.accounts[20],
+        )
+
+    def test_load_lines_unknown_prefix(self):
+        template = self._create_template("Unknown Template", 1, prefix="NOPE")
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        self.assertFalse(wizard.line_ids.account_id)
+
+    def test_load_lines_query_count(self):
+        """Resolving accounts does not depend on the number of lines"""
+        small_template = self._create_template("Small Template", 2)
+        big_template = self._create_template("Big Template", 30)
+        # shared templates have no resolved accounts, prefixes are looked for
+        (small_template | big_template).company_id = False
+        self.assertEqual(
+            self._count_load_lines_queries(small_template),
+            self._count_load_lines_queries(big_template),
+        )
+
+    def test_code_cache(self):
+        template = self._create_template("Cached Template", 2)
+        # shared templates have no resolved accounts, runs look for them
+        template.company_id = False
+        self.env.registry.clear_cache()
+        stats = self.Template._get_code_cache_stats()
+        hits = stats["_get_account_ids_by_prefix"]["hit"]
+        misses = stats["_get_account_ids_by_prefix"]["miss"]
+        for _i in range(3):
+            self.TemplateRun.create({"template_id": template.id}).load_lines()
+        stats = self.Template._get_code_cache_stats()
+        self.assertEqual(stats["_get_account_ids_by_prefix"]["miss"], misses + 1)
+        self.assertEqual(stats["_get_account_ids_by_prefix"]["hit"], hits + 2)
+        journal = self.Template._get_journal_by_code(self.journal.code, self.company)
+        self.assertEqual(journal, self.journal)
+
+    def test_code_cache_invalidation(self):
+        template = self._create_template("Invalidated Template", 1)
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        self.assertEqual(wizard.line_ids.account_id, self.accounts[0])
+        self.accounts[0].code = "OTHER000"
+        wizard.load_lines()
+        self.assertFalse(wizard.line_ids.account_id)
+        self.journal.code = "TMPLK"
+        self.assertFalse(self.Template._get_journal_by_code("TMPLJ", self.company))
+
+    def test_code_cache_unrelated_changes(self):
+        self._create_template("Unrelated Template", 1)
+        with patch.object(type(self.env.registry), "clear_cache") as clear_cache:
+            account = self.Account.create(
+                {"name": "Unrelated", "code": "ZZZ999", "account_type": "expense"}
+            )
+            account.code = "ZZZ998"
+        clear_cache.assert_not_called()
+
+    def test_generate_moves(self):
+        template = self._create_template("Headless Template", 2)
+        template.line_ids[0].balance = 100.0
+        template.line_ids[1].balance = -100.0
+        runs_count = self.TemplateRun.search_count([])
+        moves = template.generate_moves(
+            [
+                {"partner_id": self.partner.id, "ref": "Run 1"},
+                ("2026-01-31", self.partner.id, "Run 2", False, False),
+                {
+                    "ref": "Run 3",
+                    "overwrite": {"L0": {"amount": 300}, "L1": {"amount": -300}},
+                },
+            ]
+        )
+        self.assertEqual(len(moves), 3)
+        self.assertEqual(self.TemplateRun.search_count([]), runs_count)
+        self.assertEqual(moves.mapped("ref"), ["Run 1", "Run 2", "Run 3"])
+        self.assertEqual(moves[1].date, fields.Date.to_date("2026-01-31"))
+        self.assertEqual(moves.mapped("journal_id"), self.journal)
+        self.assertEqual(moves.mapped("amount_total"), [100.0, 100.0, 300.0])
+        self.assertRecordValues(
+            moves[2].line_ids.sorted("balance"),
+            [
+                {"account_id": self.accounts[1].id, "balance": -300.0},
+                {"account_id": self.accounts[0].id, "balance": 300.0},
+            ],
+        )
+
+    def test_overwrite(self):
+        template = self._create_template("Overwritten Template", 2)
+        self.assertEqual(
+            template._normalize_overwrite(
+                {"L0": {"amount": 10, "partner_id": self.partner.id}}
+            ),
+            {0: {"balance": 10, "partner_id": self.partner.id}},
+        )
+        self.assertEqual(
+            template._normalize_overwrite('{"L1": {"name": "JSON"}}'),
+            {1: {"name": "JSON"}},
+        )
+        self.assertEqual(
+            template._normalize_overwrite("{'L1': {'name': 'Python'}}"),
+            {1: {"name": "Python"}},
+        )
+        self.assertIs(
+            template._get_overwrite_schema(), template._get_overwrite_schema()
+        )
+        with self.assertRaisesRegex(ValidationError, "Lines L2 do not exist"):
+            template._normalize_overwrite({"L2": {"amount": 10}})
+        with self.assertRaisesRegex(ValidationError, "Invalid value 'ten'"):
+            template._normalize_overwrite({"L0": {"amount": "ten"}})
+        with self.assertRaisesRegex(ValidationError, "Invalid value True"):
+            template._normalize_overwrite({"L0": {"partner_id": True}})
+        with self.assertRaisesRegex(ValidationError, "Valid fields to overwrite"):
+            template._normalize_overwrite({"L0": {"debit": 10}})
+        wizard = self.TemplateRun.create(
+            {"template_id": template.id, "overwrite": '{"L1": {"name": "JSON"}}'}
+        )
+        wizard.load_lines()
+        self.assertEqual(wizard.line_ids.mapped("name"), ["Line 0", "JSON"])
+
+    @classmethod
+    def _create_formula_template(cls, name, formulas):
+        """Template with an input line L0 and one computed line per formula"""
+        return cls.Template.create(
+            {
+                "name": name,
+                "journal_code": cls.journal.code,
+                "line_ids": [
+                    Command.create(
+                        {
+                            "sequence": 0,
+                            "name": "Input",
+                            "account_code": "TMPL000",
+                            "type": "input",
+                        }
+                    )
+                ]
+                + [
+                    Command.create(
+                        {
+                            "sequence": index,
+                            "name": "Computed %d" % index,
+                            "account_code": "TMPL%03d" % index,
+                            "type": "computed",
+                            "python_code": formula,
+                        }
+                    )
+                    for index, formula in enumerate(formulas, start=1)
+                ],
+            }
+        )
+
+    def test_formula_computed_lines(self):
+        template = self._create_formula_template(
+            "Formula Template", ["-L0*1/3", "-L0 - L1"]
+        )
+        wizard = self.TemplateRun.create(
+            {"template_id": template.id, "overwrite": str({"L0": {"amount": 300}})}
+        )
+        wizard.load_lines()
+        self.assertEqual(wizard.line_ids.mapped("balance"), [300.0, -100.0, -200.0])
+        wizard.line_ids[0].balance = 600
+        move = wizard.create_move()
+        self.assertRecordValues(
+            move.line_ids.sorted("balance"),
+            [
+                {"account_id": self.accounts[2].id, "balance": -400.0},
+                {"account_id": self.accounts[1].id, "balance": -200.0},
+                {"account_id": self.accounts[0].id, "balance": 600.0},
+            ],
+        )
+
+    def test_formula_incremental_recompute(self):
+        template = self._create_formula_template(
+            "Incremental Formulas", ["-L0", "5", "L2*2", "-L1"]
+        )
+        self.assertEqual(template._get_dependent_formulas([0]), [1, 4])
+        self.assertEqual(template._get_dependent_formulas([2]), [3])
+        wizard = self.TemplateRun.create(
+            {"template_id": template.id, "overwrite": str({"L0": {"amount": 30}})}
+        )
+        wizard.load_lines()
+        self.assertEqual(
+            wizard.line_ids.mapped("balance"), [30.0, -30.0, 5.0, 10.0, 30.0]
+        )
+        wizard.line_ids[2].balance = 8.0
+        wizard.line_ids[0].balance = 50.0
+        wizard._onchange_line_ids()
+        # only the lines depending on L0 are recomputed
+        self.assertEqual(
+            wizard.line_ids.mapped("balance"), [50.0, -50.0, 8.0, 10.0, 50.0]
+        )
+        self.assertEqual(wizard.formula_inputs, {"0": 50.0})
+
+    def test_formula_program_cache(self):
+        template = self._create_formula_template("Cached Formulas", ["-L0"])
+        program = template._get_formula_program()
+        self.assertIs(template._get_formula_program(), program)
+        template.line_ids[1].python_code = "-L0/2"
+        self.assertIsNot(template._get_formula_program(), program)
+        self.assertEqual(
+            template._compute_formula_amounts({0: 10.0}), {0: 10.0, 1: -5.0}
+        )
+
+    def test_snapshot_cache(self):
+        template = self._create_template("Snapshot Template", 2)
+        snapshot = template._get_snapshot()
+        self.assertIs(template._get_snapshot(), snapshot)
+        self.assertEqual([line.sequence for line in snapshot.lines], [0, 1])
+        self.assertEqual(snapshot.account_codes, ("TMPL000", "TMPL001"))
+        template.line_ids[0].balance = 10.0
+        snapshot = template._get_snapshot()
+        self.assertEqual(snapshot.lines[0].balance, 10.0)
+        template.ref = "Not in the snapshot"
+        self.assertIs(template._get_snapshot(), snapshot)
+        template.move_type = "out_invoice"
+        self.assertEqual(template._get_snapshot().move_type, "out_invoice")
+        self.env.flush_all()
+        self.env.invalidate_all()
+        # only the snapshot version of the template is read
+        with self.assertQueryCount(1):
+            template._get_snapshot()
+
+    def test_snapshot_version_rollback(self):
+        template = self._create_template("Rolled Back Template", 1)
+        with self.assertRaises(UserError), self.env.cr.savepoint():
+            template.line_ids.account_code = "TMPL005"
+            rolled_back = template.snapshot_version
+            template._get_snapshot()
+            raise UserError("Rolled back")
+        self.env.invalidate_all()
+        template.line_ids.account_code = "TMPL006"
+        self.assertNotEqual(template.snapshot_version, rolled_back)
+        self.assertEqual(template._get_snapshot().lines[0].account_code, "TMPL006")
+
+    def test_formula_check(self):
+        template = self._create_formula_template("Checked Formulas", ["-L0"])
+        with self.assertRaisesRegex(ValidationError, "syntax of the formula"):
+            template.line_ids[1].python_code = "L0*"
+        with self.assertRaisesRegex(ValidationError, "Invalid formula"):
+            template.line_ids[1].python_code = "L0.__class__"
+        with self.assertRaisesRegex(ValidationError, "Invalid formula"):
+            template.line_ids[1].python_code = "open('/etc/passwd')"
+
+    def test_formula_dependency_order(self):
+        template = self._create_formula_template(
+            "Ordered Formulas", ["-L0 - L2", "L0/4"]
+        )
+        self.assertEqual(
+            [sequence for sequence, *_rest in template._get_formula_program()],
+            [2, 1],
+        )
+        self.assertEqual(
+            template._compute_formula_amounts({0: 100.0}),
+            {0: 100.0, 1: -125.0, 2: 25.0},
+        )
+
+    def test_formula_dependency_check(self):
+        with self.assertRaisesRegex(ValidationError, "unknown lines L7"):
+            self._create_formula_template("Unknown Reference", ["L7"])
+        with self.assertRaisesRegex(ValidationError, "lines L1, L2 reference each"):
+            self._create_formula_template("Cycle", ["-L0 - L2", "L1"])
+        with self.assertRaisesRegex(ValidationError, "lines L1 reference each"):
+            self._create_formula_template("Self Reference", ["L0 + L1"])
+        template = self._create_formula_template("Deleted Reference", ["-L0"])
+        with self.assertRaisesRegex(ValidationError, "unknown lines L0"):
+            template.line_ids[0].unlink()
+
+    def test_formula_batch(self):
+        template = self._create_formula_template(
+            "Batch Formulas", ["-round(L0/3, 2)", "-L0 - L1", "max(L0, 0)/7"]
+        )
+        rows = [{0: amount} for amount in (0.0, 100.0, -2.675, 1000000.01)]
+        self.assertEqual(
+            template._compute_formula_amounts_batch(rows),
+            [template._compute_formula_amounts(dict(row)) for row in rows],
+        )
+        template = self._create_formula_template(
+            "Rounded Formulas", ["-round(L0*1.1, 2)", "-L0 - L1"]
+        )
+        # one amount in ~70 used to be rounded differently by numpy.round
+        rng = random.Random(42)
+        rows = [{0: 21360.35}] + [
+            {0: round(rng.uniform(-100000, 100000), 2)} for _i in range(1000)
+        ]
+        self.assertEqual(
+            template._compute_formula_amounts_batch(rows),
+            [template._compute_formula_amounts(dict(row)) for row in rows],
+        )
+
+    def test_generate_moves_formulas(self):
+        template = self._create_formula_template(
+            "Headless Formulas", ["-L0*1/3", "-L0 - L1"]
+        )
+        moves = template.generate_moves(
+            [{"overwrite": {"L0": {"amount": amount}}} for amount in (300, 90)]
+        )
+        self.assertEqual(
+            [
+                move.line_ids.sorted("balance", reverse=True).mapped("balance")
+                for move in moves
+            ],
+            [[300.0, -100.0, -200.0], [90.0, -30.0, -60.0]],
+        )
+
+    def test_invoice_taxes_computed_once(self):
+        tax = self.env["account.tax"].create(
+            {"name": "Template Tax", "amount": 10.0, "type_tax_use": "sale"}
+        )
+        product = self.env["product.product"].create(
+            {"name": "Template Product", "taxes_id": [Command.set(tax.ids)]}
+        )
+        template = self._create_template("Invoice Template", 5)
+        template.write({"move_type": "out_invoice"})
+        template.line_ids.write({"product_id": product.id, "price_unit": 10.0})
+        moves = template.generate_moves([{}, {}])
+        moves.invoice_line_ids.tax_ids = False
+        MoveLine = self.registry["account.move.line"]
+        with patch.object(
+            MoveLine,
+            "_get_computed_taxes",
+            autospec=True,
+            side_effect=MoveLine._get_computed_taxes,
+        ) as get_computed_taxes:
+            template._compute_moves_tax_ids(moves)
+        self.assertEqual(get_computed_taxes.call_count, 1)
+        self.assertEqual(moves.invoice_line_ids.tax_ids, tax)
+        self.assertEqual(moves.mapped("amount_tax"), [5.0, 5.0])
+
+    def test_run_statistics(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.stats", True
+        )
+        template = self._create_formula_template("Tracked Template", ["-L0"])
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        wizard.create_move()
+        stats = self.env["account.move.template.stat"].search(
+            [("template_id", "=", template.id)]
+        )
+        self.assertEqual(stats.mapped("operation"), ["create_move", "load_lines"])
+        self.assertEqual(stats.mapped("size"), [2, 2])
+        self.assertEqual(
+            set(stats[0].phases),
+            {"prepare_move_vals", "journal_lookup", "formulas", "move_create", "taxes"},
+        )
+        self.assertIn("account_lookup", stats[1].phases)
+
+    def test_generate_payments(self):
+        bank_journal = self.env["account.journal"].create(
+            {"name": "Template Bank", "code": "TMPLB", "type": "bank"}
+        )
+        template = self.Template.create(
+            {
+                "name": "Payment Template",
+                "journal_code": bank_journal.code,
+                "is_payment": True,
+                "payment_type": "inbound",
+                "partner_type": "customer",
+            }
+        )
+        Payment = self.registry["account.payment"]
+        with patch.object(
+            Payment, "action_post", autospec=True, side_effect=Payment.action_post
+        ) as action_post:
+            payments = template.generate_payments(
+                [
+                    {"partner_id": self.partner.id, "amount": 100.0},
+                    ("2026-01-31", self.partner.id, False, 250.0, False),
+                ]
+            )
+        self.assertEqual(action_post.call_count, 1)
+        self.assertEqual(payments.mapped("amount"), [100.0, 250.0])
+        self.assertEqual(payments.journal_id, bank_journal)
+        self.assertNotIn("draft", payments.mapped("state"))
+        with self.assertRaisesRegex(UserError, "generate_payments"):
+            template.generate_moves([{}])
+
+    def test_resolved_codes(self):
+        template = self._create_template("Resolved Template", 2)
+        template.company_id = self.company
+        self.assertEqual(template.resolved_journal_id, self.journal)
+        self.assertEqual(
+            template.line_ids.resolved_account_id, self.accounts[0] | self.accounts[1]
+        )
+        self.accounts[0].code = "OTHER000"
+        self.assertFalse(template.line_ids[0].resolved_account_id)
+        self.accounts[0].code = "TMPL000"
+        self.assertEqual(template.line_ids[0].resolved_account_id, self.accounts[0])
+        self.journal.code = "TMPLK"
+        self.assertFalse(template.resolved_journal_id)
+        template.journal_code = "TMPLK"
+        self.assertEqual(template.resolved_journal_id, self.journal)
+        with patch.object(
+            type(self.Template), "_get_account_ids_by_prefix"
+        ) as lookup:
+            moves = template.generate_moves([{"ref": "Resolved"}])
+        lookup.assert_not_called()
+        self.assertEqual(moves.journal_id, self.journal)
+        self.assertEqual(
+            moves.line_ids.account_id, self.accounts[0] | self.accounts[1]
+        )
+
+    def test_resolved_codes_branch(self):
+        branch = self.env["res.company"].create(
+            {"name": "Template Branch", "parent_id": self.company.id}
+        )
+        template = self._create_template("Branch Template", 1)
+        template.company_id = branch
+        self.assertEqual(template.resolved_journal_id, self.journal)
+        self.assertEqual(template.line_ids.resolved_account_id, self.accounts[0])
+        self.accounts[0].code = "OTHER000"
+        self.journal.code = "TMPLK"
+        self.assertFalse(template.line_ids.resolved_account_id)
+        self.assertFalse(template.resolved_journal_id)
+
+    def test_run_wizard_cleanup(self):
+        template = self._create_template("Cleaned Template", 2)
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        lines = wizard.line_ids
+        wizard.create_move()
+        self.assertFalse(wizard.exists())
+        self.assertFalse(lines.exists())
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.run_keep_wizards", "1"
+        )
+        wizard = self.TemplateRun.create({"template_id": template.id})
+        wizard.load_lines()
+        wizard.create_move()
+        self.assertTrue(wizard.exists())
+        runs_count = self.TemplateRun.search_count([])
+        move = template.with_context(default_ref="In memory").generate_journal_entry(
+            persist=False
+        )
+        self.assertEqual(move.ref, "In memory")
+        self.assertEqual(self.TemplateRun.search_count([]), runs_count)
+
+    def test_run_wizard_vacuum_limits(self):
+        set_param = self.env["ir.config_parameter"].sudo().set_param
+        set_param("account_move_template.run_max_hours", "0.5")
+        set_param("account_move_template.run_max_count", "1000")
+        self.assertEqual(self.TemplateRun._get_transient_limits(), (0.5, 1000))
+
+    def test_generate_entries_for_companies(self):
+        template = self._create_template("Fan-out Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        template.company_id = False
+        other_company, no_journal_company = self.env["res.company"].create(
+            [{"name": "Fan-out Company"}, {"name": "Fan-out Company Without Journal"}]
+        )
+        other_journal = self.env["account.journal"].create(
+            {
+                "name": "Template Journal",
+                "code": "TMPLJ",
+                "type": "general",
+                "company_id": other_company.id,
+            }
+        )
+        for index in range(2):
+            self.Account.with_company(other_company).create(
+                {
+                    "name": "Template Account %d" % index,
+                    "code": "TMPL%03d" % index,
+                    "account_type": "expense",
+                    "company_ids": [Command.set(other_company.ids)],
+                }
+            )
+        companies = self.company | other_company | no_journal_company
+        self.assertEqual(
+            template._get_journal_ids_by_company(companies),
+            {self.company.id: self.journal.id, other_company.id: other_journal.id},
+        )
+        summary = template.generate_entries_for_companies(
+            companies, [{"ref": "Fan-out 1"}, {"ref": "Fan-out 2"}]
+        )
+        self.assertEqual(
+            [result["company_id"] for result in summary], companies.ids
+        )
+        self.assertEqual([result["count"] for result in summary], [2, 2, 0])
+        self.assertIn("error", summary[2])
+        moves = self.env["account.move"].browse(summary[1]["record_ids"])
+        self.assertEqual(moves.journal_id, other_journal)
+        self.assertEqual(moves.company_id, other_company)
+
+    def test_preview_moves(self):
+        template = self._create_formula_template("Previewed Template", ["-L0"])
+        moves_count = self.env["account.move"].search_count([])
+        runs_count = self.TemplateRun.search_count([])
+        previews = template.preview_moves(
+            [
+                {"ref": "Preview", "overwrite": {"L0": {"amount": 50}}},
+                {"overwrite": {"L0": {"amount": 20}, "L1": {"name": "Renamed"}}},
+            ]
+        )
+        self.assertEqual(self.env["account.move"].search_count([]), moves_count)
+        self.assertEqual(self.TemplateRun.search_count([]), runs_count)
+        self.assertEqual(previews[0]["move"]["ref"], "Preview")
+        self.assertEqual(previews[0]["move"]["journal_id"], self.journal.id)
+        self.assertEqual(
+            [(vals["account_id"], vals["balance"]) for vals in previews[0]["lines"]],
+            [(self.accounts[0].id, 50.0), (self.accounts[1].id, -50.0)],
+        )
+        self.assertTrue(previews[0]["balanced"])
+        self.assertFalse(previews[0]["missing_accounts"])
+        self.assertEqual(previews[1]["lines"][1]["name"], "Renamed")
+        unbalanced = self._create_template("Unbalanced Template", 2, prefix="NOPE")
+        preview = unbalanced.preview_moves([{"overwrite": {"L0": {"amount": 20}}}])[0]
+        self.assertEqual(preview["balance"], 20.0)
+        self.assertFalse(preview["balanced"])
+        self.assertEqual(preview["missing_accounts"], ["Line 0", "Line 1"])
+
+    def test_move_vals_cache(self):
+        template = self._create_template("Memoized Template", 2)
+        template.line_ids[0].balance = 10.0
+        template.line_ids[1].balance = -10.0
+        Template = type(self.Template)
+        compute = Template._compute_moves_vals
+        with patch.object(
+            Template, "_compute_moves_vals", autospec=True, side_effect=compute
+        ) as compute_mock:
+            moves = template.generate_moves(
+                [{"ref": "Memo 1", "date": "2026-01-31"}]
+            )
+            moves |= template.generate_moves(
+                [
+                    {"ref": "Memo 2", "date": "2026-02-28"},
+                    {
+                        "ref": "Memo 3",
+                        "overwrite": {"L0": {"amount": 20}, "L1": {"amount": -20}},
+                    },
+                ]
+            )
+            self.assertEqual(compute_mock.call_count, 2)
+            self.assertEqual(len(compute_mock.call_args.args[1]), 1)
+            template.line_ids[1].balance = -20.0
+            previews = template.preview_moves([{"ref": "Memo 4"}])
+            self.assertEqual(compute_mock.call_count, 3)
+        self.assertEqual(moves.mapped("ref"), ["Memo 1", "Memo 2", "Memo 3"])
+        self.assertEqual(
+            moves.mapped("date"),
+            [fields.Date.to_date("2026-01-31"), fields.Date.to_date("2026-02-28")]
+            + [fields.Date.context_today(template)],
+        )
+        self.assertEqual(moves.mapped("amount_total"), [10.0, 10.0, 20.0])
+        self.assertEqual(previews[0]["balance"], -10.0)
+
+    def test_move_vals_cache_lines(self):
+        template = self._create_template("Bounded Template", 2)
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_move_template.move_vals_cache_lines", 3
+        )
+        params_list = [
+            {"overwrite": {"L0": {"amount": amount}, "L1": {"amount": -amount}}}
+            for amount in (10, 20)
+        ]
+        Template = type(self.Template)
+        compute = Template._compute_moves_vals
+        with patch.object(
+            Template, "_compute_moves_vals", autospec=True, side_effect=compute
+        ) as compute_mock:
+            template.preview_moves(params_list)
+            template.preview_moves(params_list[1:])
+            template.preview_moves(params_list[:1])
+        # a move of 2 lines counts for 3, only the last one is kept
+        self.assertEqual(
+            [len(call.args[1]) for call in compute_mock.call_args_list], [2, 1]
+        )
@@ -0,0 +1,18 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+from .common import AccountMoveTemplateCommon
+
+
+class TestAccountMoveTemplateSearch(AccountMoveTemplateCommon):
+    def test_name_search(self):
+        def search_ids(name):
+            return [template_id for template_id, _name in Template.name_search(name)]
+
+        Template = self.Template
+        template = self._create_template("Monthly Rent Accrual", 1)
+        template.ref = "RENT-2024"
+        found = Template.name_search("Rent Accr")
+        self.assertIn((template.id, template.display_name), found)
+        self.assertIn(template.id, search_ids("T-202"))
+        self.assertIn(template.id, search_ids("MPLJ"))
+        template.name = "Monthly Lease Accrual"
+        self.assertNotIn(template.id, search_ids("Rent Accr"))
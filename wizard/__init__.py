@@ -1,2 +1,5 @@
+from . import account_move_template_run_mixin
 from . import account_move_template_run
 from . import account_move_template_line_run
+from . import account_move_template_replicate
+from . import account_move_template_replicate_mapping
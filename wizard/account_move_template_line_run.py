@@ -12,7 +12,7 @@ _logger = logging.getLogger(__name__)
 class AccountMoveTemplateLineRun(models.TransientModel):
     _name = "account.move.template.line.run"
     _description = "Wizard Lines to generate move from template"
-    _inherit = ["analytic.mixin"]
+    _inherit = ["analytic.mixin", "account.move.template.run.mixin"]
     _order = "sequence, id"
 
     wizard_id = fields.Many2one(
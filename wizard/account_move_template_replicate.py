@@ -0,0 +1,63 @@
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools.translate import _
+
+
+class AccountMoveTemplateReplicate(models.TransientModel):
+    _name = "account.move.template.replicate"
+    _description = "Wizard to replicate templates into other companies"
+
+    template_ids = fields.Many2many(
+        comodel_name="account.move.template",
+        string="Templates",
+        required=True,
+        default=lambda self: self._default_template_ids(),
+    )
+    company_ids = fields.Many2many(
+        comodel_name="res.company",
+        string="Target Companies",
+        required=True,
+    )
+    mapping_ids = fields.One2many(
+        comodel_name="account.move.template.replicate.mapping",
+        inverse_name="wizard_id",
+        string="Code Mapping",
+        help="Journal codes and account prefixes to replace in the copies, the "
+        "other ones being kept",
+    )
+
+    @api.model
+    def _default_template_ids(self):
+        if self.env.context.get("active_model") != "account.move.template":
+            return False
+        return self.env.context.get("active_ids")
+
+    def _get_code_maps(self):
+        """Return the journal codes and the account prefixes mappings"""
+        journal_code_map = {}
+        account_code_map = {}
+        for mapping in self.mapping_ids:
+            code_map = (
+                journal_code_map if mapping.code_type == "journal" else account_code_map
+            )
+            target_code = code_map.setdefault(mapping.source_code, mapping.target_code)
+            if target_code != mapping.target_code:
+                raise UserError(
+                    _("The code %s is mapped to several codes.") % mapping.source_code
+                )
+        return journal_code_map, account_code_map
+
+    def action_replicate(self):
+        self.ensure_one()
+        journal_code_map, account_code_map = self._get_code_maps()
+        templates = self.template_ids.replicate_to_companies(
+            self.company_ids, journal_code_map, account_code_map
+        )
+        return {
+            "name": _("Replicated Templates"),
+            "type": "ir.actions.act_window",
+            "res_model": "account.move.template",
+            "view_mode": "list,form",
+            "domain": [("id", "in", templates.ids)],
+            "context": {"active_test": False},
+        }
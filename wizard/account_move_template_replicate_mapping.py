@@ -0,0 +1,21 @@
+from odoo import fields, models
+
+
+class AccountMoveTemplateReplicateMapping(models.TransientModel):
+    _name = "account.move.template.replicate.mapping"
+    _description = "Code mapping of the replication of templates"
+
+    wizard_id = fields.Many2one(
+        comodel_name="account.move.template.replicate",
+        ondelete="cascade",
+    )
+    code_type = fields.Selection(
+        selection=[
+            ("journal", "Journal Code"),
+            ("account", "Accounts Prefix"),
+        ],
+        required=True,
+        default="account",
+    )
+    source_code = fields.Char(string="Code", required=True)
+    target_code = fields.Char(string="Replaced By", required=True)
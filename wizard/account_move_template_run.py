@@ -1,18 +1,19 @@
-from ast import literal_eval
 import logging
 
 from odoo import api, fields, models
-from odoo.exceptions import UserError, ValidationError
-from odoo.tools.safe_eval import safe_eval
+from odoo.exceptions import UserError
 from odoo.tools.translate import _
 from odoo.fields import Command
 
+from ..models.account_move_template_stat import track_phase
+
 _logger = logging.getLogger(__name__)
 
 
 class AccountMoveTemplateRun(models.TransientModel):
     _name = "account.move.template.run"
     _description = "Wizard to generate move from template"
+    _inherit = ["account.move.template.run.mixin"]
 
     template_id = fields.Many2one(
         comodel_name="account.move.template",
@@ -32,9 +33,9 @@ class AccountMoveTemplateRun(models.TransientModel):
     )
     overwrite = fields.Text(
         help="""
-             Valid dictionary to overwrite template lines:
-             {'L1': {'partner_id': 1, 'amount': 100, 'name': 'some label'},
-             'L2': {'partner_id': 2, 'amount': 200, 'name': 'some label 2'}, }
+             Valid JSON dictionary to overwrite template lines:
+             {"L1": {"partner_id": 1, "amount": 100, "name": "some label"},
+             "L2": {"partner_id": 2, "amount": 200, "name": "some label 2"}}
              """
     )
     quantity = fields.Float(
@@ -63,6 +64,10 @@ class AccountMoveTemplateRun(models.TransientModel):
         inverse_name="wizard_id",
         string="Lines",
     )
+    formula_inputs = fields.Json(
+        help="Amounts of the input lines the computed lines were last computed "
+        "with, by sequence, to only recompute the ones depending on a change",
+    )
     is_payment = fields.Boolean(
         related="template_id.is_payment",
         readonly=True,
@@ -94,13 +99,115 @@ class AccountMoveTemplateRun(models.TransientModel):
 
     def load_lines(self):
         self.ensure_one()
-        lines = [
-            (0, 0, self._prepare_wizard_line(tmpl_line))
-            for tmpl_line in self.template_id.line_ids.filtered(
-                lambda line: line.type == "input"
+        template = self.template_id
+        with template._track_run("load_lines", len(template._get_snapshot().lines)):
+            with track_phase("prepare_wizard_lines"):
+                lines_vals = self._prepare_wizard_lines()
+            amount_field = self._get_amount_field()
+            with track_phase("formulas"):
+                sequence2amount = template._compute_formula_amounts(
+                    {
+                        vals["sequence"]: vals[amount_field] or 0.0
+                        for vals in lines_vals
+                        if vals["template_type"] == "input"
+                    }
+                )
+            for vals in lines_vals:
+                if vals["template_type"] == "computed":
+                    vals[amount_field] = sequence2amount[vals["sequence"]]
+            with track_phase("write_lines"):
+                self.line_ids = [(5, 0, 0)] + [(0, 0, vals) for vals in lines_vals]
+            self.formula_inputs = {
+                str(vals["sequence"]): vals[amount_field]
+                for vals in lines_vals
+                if vals["template_type"] != "computed"
+            }
+
+    @api.onchange("line_ids")
+    def _onchange_line_ids(self):
+        """Recompute the computed lines depending on the changed input lines.
+
+        Only the formulas using a changed amount, directly or through other
+        computed lines, are evaluated again, the other lines are left as is.
+        """
+        if not self.template_id or self.formula_inputs is None:
+            return
+        amount_field = self._get_amount_field()
+        sequence2amount = {
+            line.sequence: line[amount_field] for line in self.line_ids
+        }
+        inputs = {
+            str(line.sequence): line[amount_field]
+            for line in self.line_ids
+            if line.template_type != "computed"
+        }
+        changed = [
+            int(sequence)
+            for sequence, amount in inputs.items()
+            if self.formula_inputs.get(sequence) != amount
+        ]
+        if not changed:
+            return
+        template = self.template_id
+        with template._track_run("recompute_lines", len(changed)):
+            dependents = template._get_dependent_formulas(changed)
+            template._compute_formula_amounts(sequence2amount, dependents)
+            dependents = set(dependents)
+            for line in self.line_ids:
+                if line.sequence in dependents:
+                    line[amount_field] = sequence2amount[line.sequence]
+        self.formula_inputs = inputs
+
+    def _prepare_wizard_lines(self, overwrite_vals=None):
+        """Return the values of the wizard lines, overwrite included, the
+        amounts of the computed lines being left to the caller
+
+        :param overwrite_vals: overwrite already validated by
+            ``_normalize_overwrite`` of the template, instead of the one of
+            the wizard
+        """
+        self.ensure_one()
+        if overwrite_vals is None:
+            overwrite_vals = self._get_overwrite_vals()
+        snapshot = self.template_id._get_snapshot()
+        company = self.multicompany_id or self.env.company
+        if company.id == snapshot.company_id:
+            account_map = {
+                line.account_code: line.resolved_account_id for line in snapshot.lines
+            }
+        else:
+            account_map = self.template_id._resolve_account_codes(
+                snapshot.account_codes, company
             )
+        lines_vals = []
+        for tmpl_line in snapshot.lines:
+            vals = self._prepare_wizard_line(tmpl_line, account_map)
+            vals.update(overwrite_vals.get(tmpl_line.sequence, {}))
+            lines_vals.append(vals)
+        return lines_vals
+
+    def _get_amount_field(self):
+        """Return the field of the lines holding the amount used by formulas"""
+        move_type = self.template_id._get_snapshot().move_type
+        return "balance" if move_type == "entry" else "price_unit"
+
+    def _get_valid_keys(self):
+        return [
+            "partner_id",
+            "amount",
+            "name",
+            "quantity",
+            "price_unit",
+            "discount",
+            "balance",
+            "note",
         ]
-        self.line_ids = [(5, 0, 0)] + lines
+
+    def _get_overwrite_vals(self):
+        """Return the overwrite of the wizard by line sequence, see
+        ``_normalize_overwrite`` of the template"""
+        self.ensure_one()
+        return self.template_id._normalize_overwrite(self.overwrite)
 
     def _hook_create_move(self, move_vals):
         move = 1
@@ -109,15 +216,31 @@ class AccountMoveTemplateRun(models.TransientModel):
     def create_payment(self):
         """Create a payment instead of a journal entry"""
         self.ensure_one()
+        with self.template_id._track_run("create_payment", 1):
+            payment = self._create_payment()
+        self._unlink_after_run()
+        return payment
 
-        journal = self.env["account.journal"].search(
-            [("code", "=", self.template_id.journal_code)], limit=1
+    def _create_payment(self):
+        journal = self.template_id._get_payment_journal(
+            self.multicompany_id or self.env.company
         )
+        payment_vals = self._prepare_payment_vals(journal)
+        post_in_background = self.template_id.post_in_background
+        if post_in_background:
+            payment_vals["template_post_queued"] = True
 
-        if not journal:
-            raise UserError(_("No valid journal found for this payment."))
+        with track_phase("payment_create"):
+            payment = self.env["account.payment"].create(payment_vals)
+        if not post_in_background:
+            with track_phase("post"):
+                payment.action_post()
+        self.template_id._trigger_post_queued(payment)
 
-        payment_vals = {
+        return payment
+
+    def _prepare_payment_vals(self, journal):
+        return {
             "date": self.date,
             "payment_type": self.payment_type,
             "partner_type": self.partner_type,
@@ -126,37 +249,93 @@ class AccountMoveTemplateRun(models.TransientModel):
             "amount": self.amount or 0.0,
         }
 
-        payment = self.env["account.payment"].create(payment_vals)
-        payment.action_post()
-
-        return payment
-
     def create_move(self):
         self.ensure_one()
         if self.is_payment:
             return self.create_payment()
         company = self.multicompany_id or self.env.company
         move_env = self.env["account.move"].with_company(company)
-        move_vals = self._prepare_move_vals(company)
-        for line in self.line_ids:
-            move_vals["line_ids"].append(
-                Command.create(self._prepare_move_line_vals(line))
-            )
-        move = move_env.with_context(default_move_type=self.move_type).create(move_vals)
-        for line in move.invoice_line_ids:
-            line._compute_tax_ids()
+        with self.template_id._track_run("create_move", len(self.line_ids)):
+            with track_phase("prepare_move_vals"):
+                move_vals = self._prepare_move_vals_with_lines(company)
+            if self.template_id.post_in_background:
+                move_vals["template_post_queued"] = True
+            with track_phase("move_create"):
+                move = move_env.with_context(default_move_type=self.move_type).create(
+                    move_vals
+                )
+            with track_phase("taxes"):
+                self.template_id._compute_moves_tax_ids(move)
+        self.template_id._trigger_post_queued(move)
+        self._unlink_after_run()
         return move
 
+    def _unlink_after_run(self):
+        """Delete the wizard and its lines once the entry is created, unless
+        the system parameter ``account_move_template.run_keep_wizards`` is set.
+        Wizards only living in memory are left alone."""
+        if not self.id:
+            return
+        keep = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_move_template.run_keep_wizards")
+        )
+        if not keep:
+            self.unlink()
+
+    def _prepare_move_vals_with_lines(self, company):
+        lines_vals = self._prepare_move_lines_vals()
+        # computed lines are evaluated again from the amounts of the input
+        # lines, as the user may have changed them since load_lines
+        with track_phase("formulas"):
+            sequence2amount = self.template_id._compute_formula_amounts(
+                self._get_input_amounts(lines_vals)
+            )
+        return self._assemble_move_vals(company, lines_vals, sequence2amount)
+
+    def _prepare_move_lines_vals(self):
+        """Return a list of (wizard line, move line values)"""
+        input_sequences = set(self.template_id._get_input_sequences())
+        missing_sequences = input_sequences - set(self.line_ids.mapped("sequence"))
+        if missing_sequences:
+            raise UserError(
+                _(
+                    "You deleted a line in the wizard. This is not allowed: "
+                    "you should either update the template or modify the "
+                    "journal entry that will be generated by this wizard."
+                )
+            )
+        return [(line, self._prepare_move_line_vals(line)) for line in self.line_ids]
+
+    def _get_input_amounts(self, lines_vals):
+        """Return the amounts of the input lines, by sequence"""
+        amount_field = self._get_amount_field()
+        return {
+            line.sequence: vals[amount_field]
+            for line, vals in lines_vals
+            if line.template_type != "computed"
+        }
+
+    def _assemble_move_vals(self, company, lines_vals, sequence2amount):
+        move_vals = self._prepare_move_vals(company)
+        amount_field = self._get_amount_field()
+        for line, vals in lines_vals:
+            if line.template_type == "computed":
+                vals[amount_field] = sequence2amount[line.sequence]
+            move_vals["line_ids"].append(Command.create(vals))
+        return move_vals
+
     def _prepare_move_line_vals(self, line):
         vals = {
             "name": line.name,
             "account_id": line.account_id.id,
             "analytic_distribution": line.analytic_distribution,
         }
-        if self.template_id.move_type == "entry":
+        if self.template_id._get_snapshot().move_type == "entry":
             vals["balance"] = self.balance or line.balance
 
-        elif self.template_id.move_type != "entry":
+        else:
             vals["product_id"] = line.product_id.id
             vals["quantity"] = self.quantity or line.quantity
             vals["price_unit"] = self.amount or self.price_unit or line.price_unit or 0.0
@@ -165,11 +344,8 @@ class AccountMoveTemplateRun(models.TransientModel):
         return vals
 
     def _prepare_move_vals(self, company):
-        journal = (
-            self.env["account.journal"]
-            .with_company(company)
-            .search([("code", "=", self.template_id.journal_code)], limit=1)
-        )
+        snapshot = self.template_id._get_snapshot()
+        journal = self.template_id._get_run_journal(company)
 
         if not journal:
             raise UserError(
@@ -180,28 +356,27 @@ class AccountMoveTemplateRun(models.TransientModel):
 
         return {
             "journal_id": journal.id,
-            "move_type": self.template_id.move_type,
+            "move_type": snapshot.move_type,
             "partner_id": (self.diff_partner_id or self.partner_id).id or False,
-            "invoice_payment_term_id": self.template_id.invoice_payment_term_id.id
-            or False,
+            "invoice_payment_term_id": snapshot.invoice_payment_term_id or False,
             "date": self.date,
             "ref": self.ref,
             "line_ids": [],
         }
 
-    def _prepare_wizard_line(self, tmpl_line):
-        account_id = self.env["account.account"].search(
-            [("code_store", "=", tmpl_line.account_code)], limit=1
-        )
+    def _prepare_wizard_line(self, tmpl_line, account_map):
+        """Return the values of the wizard line of ``tmpl_line``, a
+        ``TemplateLineSnapshot``"""
         vals = {
-            "wizard_id": self.id,
             "name": tmpl_line.name,
             "sequence": tmpl_line.sequence,
-            "partner_id": tmpl_line.partner_id.id or False,
-            "account_id": account_id.id,
-            "analytic_distribution": tmpl_line.analytic_distribution or False,
-            "product_id": tmpl_line.product_id.id or False,
-            "product_uom_id": tmpl_line.product_uom_id.id or False,
+            "template_type": tmpl_line.type,
+            "partner_id": tmpl_line.partner_id or False,
+            "account_id": account_map.get(tmpl_line.account_code, False),
+            "analytic_distribution": dict(tmpl_line.analytic_distribution or {})
+            or False,
+            "product_id": tmpl_line.product_id or False,
+            "product_uom_id": tmpl_line.product_uom_id or False,
             "quantity": tmpl_line.quantity or False,
             "price_unit": tmpl_line.price_unit or False,
             "discount": tmpl_line.discount or False,
@@ -0,0 +1,34 @@
+from odoo import api, models
+
+
+class AccountMoveTemplateRunMixin(models.AbstractModel):
+    _name = "account.move.template.run.mixin"
+    _description = "Vacuum limits of the run wizards of the templates"
+
+    @api.model
+    def _get_transient_limits(self):
+        """Return (max hours, max count) of the run wizards and their lines.
+
+        Same as the ``transient_age_limit`` and ``osv_memory_count_limit``
+        options, overridden by the system parameters
+        ``account_move_template.run_max_hours`` and
+        ``account_move_template.run_max_count``.
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        max_hours = get_param("account_move_template.run_max_hours")
+        max_count = get_param("account_move_template.run_max_count")
+        return (
+            float(self._transient_max_hours if max_hours is False else max_hours),
+            int(self._transient_max_count if max_count is False else max_count),
+        )
+
+    @api.autovacuum
+    def _transient_vacuum(self):
+        # autovacuum methods are called on every model, the mixin included
+        if not self._transient:
+            return
+        max_hours, max_count = self._get_transient_limits()
+        if max_hours:
+            self._transient_clean_rows_older_than(max_hours * 60 * 60)
+        if max_count:
+            self._transient_clean_old_rows(max_count)